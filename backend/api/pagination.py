@@ -0,0 +1,10 @@
+from rest_framework import pagination
+
+
+class LimitOffsetPagination(pagination.LimitOffsetPagination):
+    max_limit = 100
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    page_size_query_param = 'limit'
+    max_page_size = 100
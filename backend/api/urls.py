@@ -5,7 +5,8 @@ from rest_framework import routers
 from tags.views import TagsViewSet
 from recipes.views import (RecipeViewSet, IngredientsViewSet,
                            FavoriteViewSet, ShoppingCartViewSet,
-                           DownloadShoppingCartView)
+                           DownloadShoppingCartView, BulkFavoriteView,
+                           BulkShoppingCartView)
 
 
 router = routers.DefaultRouter()
@@ -19,6 +20,16 @@ urlpatterns = [
         FavoriteViewSet.as_view(),
         name='favorite'
     ),
+    path(
+        'recipes/favorite/',
+        BulkFavoriteView.as_view(),
+        name='bulk_favorite'
+    ),
+    path(
+        'recipes/shopping_cart/',
+        BulkShoppingCartView.as_view(),
+        name='bulk_shopping_cart'
+    ),
     path(
         'recipes/download_shopping_cart/',
         DownloadShoppingCartView.as_view(),
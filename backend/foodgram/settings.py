@@ -98,6 +98,21 @@ DATABASES = {
 }
 
 
+# Кеш хранит версии, ключи инвалидации и блокировки перестроения, поэтому
+# он должен быть общим для всех воркеров и management-команд. LocMemCache
+# подходит только для разработки и тестов, в docker-compose используется
+# memcached.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -144,6 +159,13 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CSV_FILE_DIR = os.path.join(BASE_DIR, 'data')
 
+CATALOG_FILE = os.getenv('CATALOG_FILE', os.path.join(BASE_DIR, 'catalog.bin'))
+
+SIMILARITY_INDEX_FILE = os.getenv(
+    'SIMILARITY_INDEX_FILE',
+    os.path.join(BASE_DIR, 'similarity.npz')
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -160,7 +182,7 @@ REST_FRAMEWORK = {
 
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
 
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 6,
 }
 
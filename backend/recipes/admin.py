@@ -13,7 +13,7 @@ class RecipeAdmin(admin.ModelAdmin):
     get_author_full_name.short_description = 'Автор'
 
     def get_favorite_count(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
     get_favorite_count.short_description = 'Добавлений в избранное'
 
 
@@ -5,3 +5,9 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .catalog import get_catalog
+
+        get_catalog()
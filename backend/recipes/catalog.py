@@ -0,0 +1,188 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Ingredients
+from tags.models import Tags
+
+
+MAGIC = b'FGCATLG1'
+HEADER = struct.Struct('<8sQII')
+RECORD = struct.Struct('<QIIII')
+CHECK_INTERVAL = 1.0
+
+
+def write_catalog(path=None):
+    path = path or settings.CATALOG_FILE
+    sections = (
+        Ingredients.objects.order_by('id').values_list(
+            'id',
+            'name',
+            'measurement_unit'
+        ),
+        Tags.objects.order_by('id').values_list('id', 'name', 'slug'),
+    )
+    sections = [list(rows) for rows in sections]
+    heap_offset = HEADER.size + RECORD.size * sum(map(len, sections))
+    records, heap = [], bytearray()
+
+    for rows in sections:
+        for row_id, first, second in rows:
+            first, second = first.encode(), second.encode()
+            records.append(RECORD.pack(
+                row_id,
+                heap_offset + len(heap), len(first),
+                heap_offset + len(heap) + len(first), len(second)
+            ))
+            heap += first + second
+
+    version = time.time_ns()
+    temp_path = f'{path}.{os.getpid()}.tmp'
+
+    with open(temp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, version, *map(len, sections)))
+        file.write(b''.join(records))
+        file.write(heap)
+
+    os.replace(temp_path, path)
+    return version
+
+
+def refresh_catalog():
+    if os.path.exists(settings.CATALOG_FILE):
+        write_catalog()
+
+
+class Catalog:
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.inode = os.fstat(file.fileno()).st_ino
+            self.buffer = mmap.mmap(
+                file.fileno(),
+                0,
+                access=mmap.ACCESS_READ
+            )
+
+        magic, self.version, ingredients_count, tags_count = (
+            HEADER.unpack_from(self.buffer)
+        )
+
+        if magic != MAGIC:
+            raise ValueError(f'{path} не является файлом каталога.')
+
+        self.ingredients_section = (HEADER.size, ingredients_count)
+        self.tags_section = (
+            HEADER.size + RECORD.size * ingredients_count,
+            tags_count
+        )
+
+    def read(self, section, index):
+        offset, _ = section
+        row_id, first_offset, first_length, second_offset, second_length = (
+            RECORD.unpack_from(self.buffer, offset + RECORD.size * index)
+        )
+        return (
+            row_id,
+            self.buffer[first_offset:first_offset + first_length].decode(),
+            self.buffer[second_offset:second_offset + second_length].decode()
+        )
+
+    def find(self, section, row_id):
+        offset, count = section
+        low, high = 0, count
+
+        while low < high:
+            middle = (low + high) // 2
+            middle_id = RECORD.unpack_from(
+                self.buffer,
+                offset + RECORD.size * middle
+            )[0]
+
+            if middle_id < row_id:
+                low = middle + 1
+            elif middle_id > row_id:
+                high = middle
+            else:
+                return self.read(section, middle)
+
+        return None
+
+    def ingredient(self, ingredient_id):
+        row = self.find(self.ingredients_section, ingredient_id)
+
+        if row is None:
+            return None
+
+        return {'id': row[0], 'name': row[1], 'measurement_unit': row[2]}
+
+    def ingredients(self):
+        return [
+            {'id': row_id, 'name': name, 'measurement_unit': unit}
+            for row_id, name, unit in (
+                self.read(self.ingredients_section, index)
+                for index in range(self.ingredients_section[1])
+            )
+        ]
+
+    def tag(self, tag_id):
+        row = self.find(self.tags_section, tag_id)
+
+        if row is None:
+            return None
+
+        return {'id': row[0], 'name': row[1], 'slug': row[2]}
+
+    def tags(self):
+        return [
+            {'id': row_id, 'name': name, 'slug': slug}
+            for row_id, name, slug in (
+                self.read(self.tags_section, index)
+                for index in range(self.tags_section[1])
+            )
+        ]
+
+
+class CatalogLoader:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.catalog = None
+        self.checked_at = None
+
+    def get(self):
+        now = time.monotonic()
+
+        if (self.checked_at is not None
+                and now - self.checked_at < CHECK_INTERVAL):
+            return self.catalog
+
+        with self.lock:
+            self.checked_at = now
+
+            try:
+                inode = os.stat(settings.CATALOG_FILE).st_ino
+            except FileNotFoundError:
+                self.catalog = None
+                return None
+
+            if self.catalog is None or self.catalog.inode != inode:
+                self.catalog = Catalog(settings.CATALOG_FILE)
+
+            return self.catalog
+
+    def reset(self):
+        with self.lock:
+            self.catalog = None
+            self.checked_at = None
+
+
+catalog_loader = CatalogLoader()
+
+
+def get_catalog():
+    return catalog_loader.get()
@@ -0,0 +1,98 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import Recipes
+
+
+def viewer_cache_key(user_id):
+    return f'recipes:viewer:{user_id}'
+
+
+def touch_viewer(user_id):
+    cache.set(viewer_cache_key(user_id), time.time(), None)
+
+
+def viewer_modified_at(user):
+    if not user.is_authenticated:
+        return None
+
+    return cache.get_or_set(viewer_cache_key(user.id), time.time, None)
+
+
+class ConditionalRecipeMixin:
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list,
+            self.list_state(),
+            None,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def list_state(self):
+        state = self.filter_queryset(Recipes.objects.all()).aggregate(
+            modified_at=Max('modified_at'),
+            count=Count('id')
+        )
+        return (state['count'], state['modified_at'])
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = str(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        modified_at = None
+
+        if lookup.isdigit():
+            modified_at = Recipes.objects.filter(pk=lookup).values_list(
+                'modified_at',
+                flat=True
+            ).first()
+
+        if modified_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        return self.conditional_response(
+            super().retrieve,
+            (modified_at,),
+            modified_at,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def conditional_response(self, handler, state, modified_at, request,
+                             *args, **kwargs):
+        viewer_at = viewer_modified_at(request.user)
+        last_modified = None
+
+        if modified_at is not None:
+            last_modified = int(max(modified_at.timestamp(), viewer_at or 0))
+
+        etag = quote_etag(hashlib.sha1(repr(
+            (state, request.user.id, viewer_at)
+        ).encode()).hexdigest())
+
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+
+        patch_vary_headers(response, ('Authorization',))
+        return response
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipes
+from users.models import Followers
+
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipes, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipes, 'author'),
+    (User, 'followers_count', Followers, 'following'),
+)
+
+
+def change_counter(model, field, ids, delta):
+    queryset = model.objects.filter(id__in=ids)
+
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_counters(instance, delta):
+    for model, field, related_model, related_field in COUNTERS:
+        if isinstance(instance, related_model):
+            change_counter(
+                model,
+                field,
+                [getattr(instance, f'{related_field}_id')],
+                delta
+            )
+
+
+def expected_count(related_model, related_field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{related_field: OuterRef('pk')}
+            ).order_by().values(related_field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        Value(0)
+    )
+
+
+def counter_drift():
+    for model, field, related_model, related_field in COUNTERS:
+        rows = model.objects.annotate(
+            expected=expected_count(related_model, related_field)
+        ).exclude(
+            **{field: F('expected')}
+        ).values_list('id', field, 'expected')
+
+        for row_id, actual, expected in rows:
+            yield model, field, row_id, actual, expected
+
+
+def reconcile_counters():
+    drift = list(counter_drift())
+
+    for model, field, related_model, related_field in COUNTERS:
+        ids = [
+            row_id for drift_model, drift_field, row_id, _, _ in drift
+            if drift_model is model and drift_field == field
+        ]
+
+        if ids:
+            model.objects.filter(id__in=ids).update(
+                **{field: expected_count(related_model, related_field)}
+            )
+
+    return drift
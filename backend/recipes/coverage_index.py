@@ -0,0 +1,197 @@
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .models import IngredientsInRecipe, Recipes
+
+
+RECIPE_INGREDIENTS_VERSION_CACHE_KEY = 'recipes:ingredients:version'
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+def bump_recipe_ingredients_version():
+    cache.set(RECIPE_INGREDIENTS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def schedule_coverage_update():
+    bump_recipe_ingredients_version()
+    transaction.on_commit(bump_recipe_ingredients_version)
+
+
+def load_recipe_ingredients(recipes):
+    recipe_ingredients = {
+        recipe_id: [] for recipe_id in recipes.values_list('id', flat=True)
+    }
+
+    for recipe_id, ingredient_id in IngredientsInRecipe.objects.filter(
+        recipe__in=recipes
+    ).values_list('recipe_id', 'ingredient_id').iterator():
+        recipe_ingredients.setdefault(recipe_id, []).append(ingredient_id)
+
+    return {
+        recipe_id: tuple(ingredient_ids)
+        for recipe_id, ingredient_ids in recipe_ingredients.items()
+    }
+
+
+def recipes_synced_at():
+    return Recipes.objects.aggregate(
+        synced_at=Max('modified_at')
+    )['synced_at']
+
+
+def recipe_ingredient_changes(synced_at, known_ids):
+    changes = load_recipe_ingredients(Recipes.objects.filter(
+        modified_at__gte=synced_at - SYNC_OVERLAP
+    ))
+    changes.update(
+        (recipe_id, None)
+        for recipe_id in set(known_ids).difference(
+            Recipes.objects.order_by().values_list('id', flat=True).iterator()
+        )
+    )
+    return changes
+
+
+class CoverageState:
+
+    def __init__(self, version, synced_at, recipe_ingredients):
+        self.version = version
+        self.synced_at = synced_at
+        self.recipe_ingredients = recipe_ingredients
+        postings = defaultdict(list)
+
+        for recipe_id, ingredient_ids in recipe_ingredients.items():
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].append(recipe_id)
+
+        self.postings = {
+            ingredient_id: np.array(sorted(recipe_ids), dtype=np.int64)
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self.sizes = np.zeros(
+            max(recipe_ingredients, default=0) + 1,
+            dtype=np.int64
+        )
+
+        for recipe_id, ingredient_ids in recipe_ingredients.items():
+            self.sizes[recipe_id] = len(ingredient_ids)
+
+    def patch(self, version, synced_at, changes):
+        state = CoverageState.__new__(CoverageState)
+        state.version = version
+        state.synced_at = synced_at
+        state.recipe_ingredients = dict(self.recipe_ingredients)
+        state.postings = dict(self.postings)
+        state.sizes = np.zeros(
+            max(len(self.sizes), max(changes, default=0) + 1),
+            dtype=np.int64
+        )
+        state.sizes[:len(self.sizes)] = self.sizes
+
+        for recipe_id, ingredient_ids in changes.items():
+            for ingredient_id in state.recipe_ingredients.pop(recipe_id, ()):
+                recipe_ids = state.postings[ingredient_id]
+                state.postings[ingredient_id] = recipe_ids[
+                    recipe_ids != recipe_id
+                ]
+
+            if ingredient_ids is None:
+                state.sizes[recipe_id] = 0
+                continue
+
+            for ingredient_id in ingredient_ids:
+                recipe_ids = state.postings.get(
+                    ingredient_id,
+                    np.array([], dtype=np.int64)
+                )
+                state.postings[ingredient_id] = np.insert(
+                    recipe_ids,
+                    np.searchsorted(recipe_ids, recipe_id),
+                    recipe_id
+                )
+
+            state.recipe_ingredients[recipe_id] = ingredient_ids
+            state.sizes[recipe_id] = len(ingredient_ids)
+
+        return state
+
+
+class IngredientCoverageIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = None
+
+    def get_state(self):
+        version = cache.get(RECIPE_INGREDIENTS_VERSION_CACHE_KEY)
+        state = self.state
+
+        if state is not None and state.version == version:
+            return state
+
+        with self.lock:
+            if self.state is not None and self.state.version == version:
+                return self.state
+
+            synced_at = recipes_synced_at()
+
+            if self.state is None or self.state.synced_at is None:
+                self.state = CoverageState(
+                    version,
+                    synced_at,
+                    load_recipe_ingredients(Recipes.objects.all())
+                )
+            else:
+                self.state = self.state.patch(
+                    version,
+                    synced_at,
+                    recipe_ingredient_changes(
+                        self.state.synced_at,
+                        self.state.recipe_ingredients.keys()
+                    )
+                )
+
+            return self.state
+
+    def reset(self):
+        with self.lock:
+            self.state = None
+
+    def rank(self, ingredient_ids):
+        state = self.get_state()
+        postings = [
+            state.postings[ingredient_id]
+            for ingredient_id in set(ingredient_ids)
+            if ingredient_id in state.postings
+        ]
+
+        if not postings:
+            return []
+
+        counts = np.bincount(
+            np.concatenate(postings),
+            minlength=len(state.sizes)
+        )
+        recipe_ids = np.flatnonzero(counts)
+        covered = counts[recipe_ids]
+        missing = state.sizes[recipe_ids] - covered
+        order = np.lexsort((-recipe_ids, missing, -covered))
+
+        return [
+            (int(recipe_id), int(covered_count), int(missing_count))
+            for recipe_id, covered_count, missing_count in zip(
+                recipe_ids[order],
+                covered[order],
+                missing[order]
+            )
+        ]
+
+
+coverage_index = IngredientCoverageIndex()
@@ -0,0 +1,56 @@
+import csv
+import json
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def export_txt(ingredients):
+    yield 'Список покупок:\n\n'
+
+    for ingredient in ingredients:
+        yield (
+            f"{ingredient['ingredient__name']} "
+            f"({ingredient['ingredient__measurement_unit']}): "
+            f"{ingredient['total_amount']}\n"
+        )
+
+
+def export_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['total_amount']
+        ))
+
+
+def export_json(ingredients):
+    yield '['
+
+    for index, ingredient in enumerate(ingredients):
+        if index:
+            yield ', '
+
+        yield json.dumps(
+            {
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient['ingredient__measurement_unit'],
+                'amount': ingredient['total_amount']
+            },
+            ensure_ascii=False
+        )
+
+    yield ']'
+
+
+EXPORTERS = {
+    'txt': (export_txt, 'text/plain'),
+    'csv': (export_csv, 'text/csv'),
+    'json': (export_json, 'application/json'),
+}
@@ -0,0 +1,69 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import RecipeTags
+from .single_flight import single_flight
+from tags.models import Tags, TAGS_VERSION_CACHE_KEY
+
+
+RECIPE_FACETS_VERSION_CACHE_KEY = 'recipes:facets:version'
+FACETS = ('tags',)
+
+
+def bump_facets_version():
+    cache.set(RECIPE_FACETS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def schedule_facets_update():
+    bump_facets_version()
+    transaction.on_commit(bump_facets_version)
+
+
+def facets_version():
+    return (
+        cache.get(RECIPE_FACETS_VERSION_CACHE_KEY),
+        cache.get(TAGS_VERSION_CACHE_KEY)
+    )
+
+
+def requested_facets(query_params):
+    return [
+        facet
+        for values in query_params.getlist('facets')
+        for facet in values.split(',')
+        if facet in FACETS
+    ]
+
+
+def tag_counts(recipes):
+    counts = dict(
+        RecipeTags.objects.filter(
+            recipe__in=recipes.order_by().values('id')
+        ).order_by().values('tag_id').annotate(
+            count=Count('id')
+        ).values_list('tag_id', 'count')
+    )
+    return {
+        slug: counts.get(tag_id, 0)
+        for slug, tag_id in Tags.objects.slug_ids().items()
+    }
+
+
+def facets_cache_key(filters):
+    version, tags_version = facets_version()
+    digest = hashlib.sha1(repr(sorted(filters.items())).encode()).hexdigest()
+    return f'recipes:facets:tags:{version}:{tags_version}:{digest}'
+
+
+def get_tag_counts(recipes, filters, user):
+    if user.is_authenticated:
+        return tag_counts(recipes)
+
+    return single_flight.get_or_set(
+        facets_cache_key(filters),
+        lambda: tag_counts(recipes)
+    )
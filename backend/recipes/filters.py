@@ -1,5 +1,10 @@
 import django_filters as filters
-from .models import Ingredients, Recipes
+from django.db.models import Exists, OuterRef
+
+from .models import Ingredients, Recipes, RecipeTags
+from .rankings import RANKINGS, order_by_ranking
+from .search import search_recipes
+from tags.models import Tags
 
 
 class IngredientFilter(filters.FilterSet):
@@ -11,14 +16,22 @@ class IngredientFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
-    author = filters.NumberFilter(field_name='author__id')    
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    author = filters.NumberFilter(field_name='author__id')
+    tags = filters.MultipleChoiceFilter(
+        choices=Tags.objects.slug_choices,
+        method='tags_filter'
+    )
     is_in_shopping_cart = filters.NumberFilter(
         method='is_in_shopping_cart_filter'
     )
     is_favorited = filters.NumberFilter(
         method='is_favorited_filter'
     )
+    search = filters.CharFilter(method='search_filter')
+    ordering = filters.ChoiceFilter(
+        choices=[(ranking, ranking) for ranking in RANKINGS],
+        method='ordering_filter'
+    )
 
     class Meta:
         model = Recipes
@@ -28,6 +41,23 @@ class RecipeFilter(filters.FilterSet):
             'tags',
         )
 
+    def tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+
+        slug_ids = Tags.objects.slug_ids()
+
+        return queryset.filter(Exists(RecipeTags.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[slug_ids[slug] for slug in value]
+        )))
+
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def ordering_filter(self, queryset, name, value):
+        return order_by_ranking(queryset, value)
+
     def is_in_shopping_cart_filter(self, queryset, name, value):
         user = self.request.user
 
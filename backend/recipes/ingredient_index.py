@@ -0,0 +1,84 @@
+import threading
+import uuid
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .catalog import get_catalog
+from .models import Ingredients
+
+
+INGREDIENTS_VERSION_CACHE_KEY = 'ingredients:version'
+
+
+def bump_ingredients_version():
+    cache.set(INGREDIENTS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = None
+
+    def get_state(self):
+        catalog = get_catalog()
+        version = (
+            catalog.version if catalog is not None
+            else cache.get(INGREDIENTS_VERSION_CACHE_KEY)
+        )
+        state = self.state
+
+        if state is not None and state[0] == version:
+            return state
+
+        with self.lock:
+            if self.state is not None and self.state[0] == version:
+                return self.state
+
+            if catalog is not None:
+                rows = catalog.ingredients()
+            else:
+                rows = Ingredients.objects.values(
+                    'id',
+                    'name',
+                    'measurement_unit'
+                )
+
+            ingredients = sorted(
+                (ingredient['name'].casefold(), ingredient['id'], ingredient)
+                for ingredient in rows
+            )
+            self.state = (
+                version,
+                [key for key, _, _ in ingredients],
+                [ingredient for _, _, ingredient in ingredients]
+            )
+            return self.state
+
+    def search(self, query, limit=None):
+        _, keys, ingredients = self.get_state()
+        query = query.casefold()
+        results = []
+        position = bisect_left(keys, query)
+
+        while (position < len(keys)
+               and keys[position].startswith(query)
+               and (limit is None or len(results) < limit)):
+            results.append(ingredients[position])
+            position += 1
+
+        if limit is not None and len(results) >= limit:
+            return results
+
+        for key, ingredient in zip(keys, ingredients):
+            if query in key and not key.startswith(query):
+                results.append(ingredient)
+
+                if limit is not None and len(results) >= limit:
+                    break
+
+        return results
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.catalog import write_catalog
+
+
+class Command(BaseCommand):
+    help = 'Записывает каталог ингредиентов и тегов для общей памяти.'
+
+    def handle(self, *args, **kwargs):
+        version = write_catalog()
+        print(f'Каталог {settings.CATALOG_FILE} записан, версия {version}!')
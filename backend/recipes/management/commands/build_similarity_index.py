@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import write_similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Записывает MinHash-индекс похожих рецептов.'
+
+    def handle(self, *args, **kwargs):
+        count = write_similarity_index()
+        print(
+            f'Индекс похожих рецептов {settings.SIMILARITY_INDEX_FILE} '
+            f'записан, рецептов: {count}!'
+        )
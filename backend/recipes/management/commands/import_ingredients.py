@@ -3,6 +3,8 @@ import csv
 from django.core.management.base import BaseCommand
 
 from foodgram.settings import CSV_FILE_DIR
+from recipes.catalog import refresh_catalog
+from recipes.ingredient_index import bump_ingredients_version
 from recipes.models import Ingredients
 
 
@@ -22,5 +24,7 @@ class Command(BaseCommand):
                 for row in reader
             ]
             Ingredients.objects.bulk_create(ingredients)
+            bump_ingredients_version()
+            refresh_catalog()
 
         print('Ингредиенты импортированы!')
@@ -3,7 +3,9 @@ import csv
 from django.core.management.base import BaseCommand
 
 from foodgram.settings import CSV_FILE_DIR
+from recipes.catalog import refresh_catalog
 from recipes.models import Tags
+from tags.signals import clear_tags_cache
 
 
 class Command(BaseCommand):
@@ -22,5 +24,7 @@ class Command(BaseCommand):
                 for row in reader
             ]
             Tags.objects.bulk_create(tags)
+            clear_tags_cache()
+            refresh_catalog()
 
         print('Теги импортированы!')
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListLine
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает или проверяет агрегированные списки покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сравнить списки покупок с корзинами.'
+        )
+
+    def handle(self, *args, **kwargs):
+        if not kwargs['check']:
+            ShoppingListLine.objects.rebuild()
+            print('Списки покупок пересобраны!')
+            return
+
+        expected = ShoppingListLine.objects.expected_totals()
+        actual = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount
+            in ShoppingListLine.objects.values_list(
+                'user_id',
+                'ingredient_id',
+                'total_amount'
+            )
+        }
+        mismatches = sorted(
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        )
+
+        for user_id, ingredient_id in mismatches:
+            print(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected.get((user_id, ingredient_id), 0)}, '
+                f'сохранено {actual.get((user_id, ingredient_id), 0)}'
+            )
+
+        if mismatches:
+            raise CommandError(
+                f'Расхождений в списках покупок: {len(mismatches)}.'
+            )
+
+        print('Списки покупок согласованы!')
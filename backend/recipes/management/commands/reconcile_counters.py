@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import counter_drift, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Проверяет и исправляет счётчики рецептов, избранного и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сообщить о расхождениях.'
+        )
+
+    def handle(self, *args, **kwargs):
+        drift = (
+            list(counter_drift()) if kwargs['check']
+            else reconcile_counters()
+        )
+
+        for model, field, row_id, actual, expected in drift:
+            print(
+                f'{model._meta.verbose_name} {row_id}, {field}: '
+                f'ожидается {expected}, сохранено {actual}'
+            )
+
+        if drift and kwargs['check']:
+            raise CommandError(f'Расхождений в счётчиках: {len(drift)}.')
+
+        if drift:
+            print(f'Исправлено счётчиков: {len(drift)}!')
+        else:
+            print('Счётчики согласованы!')
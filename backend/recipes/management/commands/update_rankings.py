@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.rankings import update_rankings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярных и трендовых рецептов.'
+
+    def handle(self, *args, **kwargs):
+        count = update_rankings()
+        print(f'Рейтинги рецептов пересчитаны, рецептов: {count}!')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import update_search_vectors, uses_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы рецептов.'
+
+    def handle(self, *args, **kwargs):
+        update_search_vectors()
+
+        if uses_search_vector():
+            print('Поисковые векторы рецептов обновлены!')
+        else:
+            print('Поисковый индекс рецептов будет перестроен в памяти!')
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    IngredientsInRecipe = apps.get_model('recipes', 'IngredientsInRecipe')
+    ShoppingListLine = apps.get_model('recipes', 'ShoppingListLine')
+    ShoppingListLine.objects.bulk_create(
+        (
+            ShoppingListLine(
+                user_id=row['recipe__shopping_cart__user'],
+                ingredient_id=row['ingredient'],
+                total_amount=row['total_amount']
+            )
+            for row in IngredientsInRecipe.objects.filter(
+                recipe__shopping_cart__isnull=False
+            ).values(
+                'recipe__shopping_cart__user',
+                'ingredient'
+            ).annotate(
+                total_amount=Sum('amount')
+            ).order_by()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_alter_recipes_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredients', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Строка списка покупок',
+                'verbose_name_plural': 'Список покупок',
+                'unique_together': {('user', 'ingredient')},
+            },
+        ),
+        migrations.RunPython(
+            fill_shopping_lists,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0002_alter_tags_slug'),
+        ('recipes', '0005_shoppinglistline'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='recipetags',
+            unique_together={('tag', 'recipe')},
+        ),
+    ]
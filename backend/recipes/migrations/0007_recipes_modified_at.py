@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_alter_recipetags_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='modified_at',
+            field=models.DateTimeField(
+                auto_now=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name='Дата изменения'
+            ),
+            preserve_default=False,
+        ),
+    ]
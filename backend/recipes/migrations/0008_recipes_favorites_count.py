@@ -0,0 +1,34 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:17
+
+from django.db import migrations, models
+
+from recipes.counters import expected_count
+
+
+def fill_counters(apps, schema_editor):
+    Recipes = apps.get_model('recipes', 'Recipes')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Recipes.objects.update(
+        favorites_count=expected_count(Favorite, 'recipe')
+    )
+    CustomUser.objects.update(
+        recipes_count=expected_count(Recipes, 'author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipes_modified_at'),
+        ('users', '0002_customuser_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+class AddPostgresIndex(migrations.AddIndex):
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label,
+                schema_editor,
+                from_state,
+                to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label,
+                schema_editor,
+                from_state,
+                to_state
+            )
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Recipes = apps.get_model('recipes', 'Recipes')
+    IngredientsInRecipe = apps.get_model('recipes', 'IngredientsInRecipe')
+    ingredient_names = Subquery(
+        IngredientsInRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', delimiter=' ')
+        ).values('names')
+    )
+    Recipes.objects.update(search_vector=(
+        django.contrib.postgres.search.SearchVector(
+            'name',
+            weight='A',
+            config='russian'
+        )
+        + django.contrib.postgres.search.SearchVector(
+            ingredient_names,
+            weight='B',
+            config='russian'
+        )
+        + django.contrib.postgres.search.SearchVector(
+            'text',
+            weight='C',
+            config='russian'
+        )
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipes_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        AddPostgresIndex(
+            model_name='recipes',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipes_search_vector_gin'),
+        ),
+        migrations.RunPython(
+            fill_search_vectors,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_rankings(apps, schema_editor):
+    Recipes = apps.get_model('recipes', 'Recipes')
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    now = django.utils.timezone.now()
+    RecipeRanking.objects.bulk_create(
+        (
+            RecipeRanking(
+                recipe_id=recipe_id,
+                popular=0.0,
+                trending=0.0,
+                computed_at=now
+            )
+            for recipe_id in Recipes.objects.values_list(
+                'id',
+                flat=True
+            ).iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipes_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='recipes.recipes', verbose_name='Рецепт')),
+                ('popular', models.FloatField(verbose_name='Популярность')),
+                ('trending', models.FloatField(verbose_name='Тренд')),
+                ('computed_at', models.DateTimeField(verbose_name='Дата расчёта')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-popular', '-recipe'], name='recipe_ranking_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipe_ranking_trending'),
+        ),
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connection, models, transaction
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
 from django.contrib.auth import get_user_model
 
 from tags.models import Tags
+from users.models import CounterFieldsMixin
 
 
 User = get_user_model()
@@ -23,7 +28,7 @@ class Ingredients(models.Model):
         verbose_name_plural = 'Ингредиенты'
 
 
-class Recipes(models.Model):
+class Recipes(CounterFieldsMixin, models.Model):
     tags = models.ManyToManyField(
         Tags,
         through='RecipeTags',
@@ -63,10 +68,34 @@ class Recipes(models.Model):
         blank=False,
         null=False
     )
+    modified_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    counter_fields = ('favorites_count',)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            GinIndex(
+                fields=('search_vector',),
+                name='recipes_search_vector_gin'
+            ),
+        )
 
 
 class IngredientsInRecipe(models.Model):
@@ -98,6 +127,9 @@ class RecipeTags(models.Model):
         null=False
     )
 
+    class Meta:
+        unique_together = ('tag', 'recipe')
+
 
 class Favorite(models.Model):
     user = models.ForeignKey(
@@ -112,6 +144,11 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
         related_name='favorite'
     )
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         unique_together = ('user', 'recipe')
@@ -132,6 +169,205 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
         related_name='shopping_cart'
     )
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         unique_together = ('user', 'recipe')
+
+
+class RecipeRanking(models.Model):
+    recipe = models.OneToOneField(
+        Recipes,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='ranking'
+    )
+    popular = models.FloatField(verbose_name='Популярность')
+    trending = models.FloatField(verbose_name='Тренд')
+    computed_at = models.DateTimeField(verbose_name='Дата расчёта')
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(
+                fields=('-popular', '-recipe'),
+                name='recipe_ranking_popular'
+            ),
+            models.Index(
+                fields=('-trending', '-recipe'),
+                name='recipe_ranking_trending'
+            ),
+        )
+
+
+class ShoppingListLineManager(models.Manager):
+
+    def apply_amounts(self, user_ids, amounts):
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items()
+            if amount
+        }
+        user_ids = list(user_ids)
+
+        if not user_ids or not amounts:
+            return
+
+        with transaction.atomic():
+            lock_users(user_ids)
+            lines = {
+                (line.user_id, line.ingredient_id): line
+                for line in self.select_for_update().filter(
+                    user_id__in=user_ids,
+                    ingredient_id__in=amounts
+                )
+            }
+            new_lines, changed_lines, empty_line_ids = [], [], []
+
+            for user_id in user_ids:
+                for ingredient_id, amount in amounts.items():
+                    line = lines.get((user_id, ingredient_id))
+
+                    if line is None:
+                        if amount > 0:
+                            new_lines.append(self.model(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                total_amount=amount
+                            ))
+                        continue
+
+                    line.total_amount += amount
+
+                    if line.total_amount > 0:
+                        changed_lines.append(line)
+                    else:
+                        empty_line_ids.append(line.id)
+
+            self.bulk_create(new_lines)
+            self.bulk_update(changed_lines, ['total_amount'])
+            self.filter(id__in=empty_line_ids).delete()
+
+    def add_recipes(self, user, recipe_ids):
+        self.apply_amounts([user.id], recipes_amounts(recipe_ids))
+
+    def remove_recipes(self, user, recipe_ids):
+        self.apply_amounts([user.id], {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipes_amounts(recipe_ids).items()
+        })
+
+    def remove_recipe_from_carts(self, recipe_id):
+        self.apply_amounts(
+            ShoppingCart.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('user_id', flat=True),
+            {
+                ingredient_id: -amount
+                for ingredient_id, amount
+                in recipes_amounts([recipe_id]).items()
+            }
+        )
+
+    def expected_totals(self):
+        return {
+            (row['recipe__shopping_cart__user'], row['ingredient']):
+                row['total_amount']
+            for row in IngredientsInRecipe.objects.filter(
+                recipe__shopping_cart__isnull=False
+            ).values(
+                'recipe__shopping_cart__user',
+                'ingredient'
+            ).annotate(
+                total_amount=Sum('amount')
+            ).order_by()
+        }
+
+    def rebuild(self):
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                self.model(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=total_amount
+                )
+                for (user_id, ingredient_id), total_amount
+                in self.expected_totals().items()
+            )
+
+
+def lock_users(user_ids):
+    if not connection.features.has_select_for_update:
+        return
+
+    list(User.objects.select_for_update().filter(
+        id__in=user_ids
+    ).order_by('id').values_list('id', flat=True))
+
+
+def recipes_amounts(recipe_ids):
+    if not recipe_ids:
+        return {}
+
+    return dict(
+        IngredientsInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values(
+            'ingredient_id'
+        ).annotate(
+            total_amount=Sum('amount')
+        ).values_list('ingredient_id', 'total_amount')
+    )
+
+
+def latest_recipes(author_ids, limit=None):
+    recipes = Recipes.objects.filter(
+        author_id__in=author_ids
+    ).only('id', 'author_id', 'name', 'image', 'cooking_time')
+
+    if limit is None:
+        return list(recipes.order_by('author_id', '-id'))
+
+    ranked = recipes.annotate(row_number=Window(
+        expression=RowNumber(),
+        partition_by=[F('author_id')],
+        order_by=F('id').desc()
+    ))
+    sql, params = ranked.query.sql_with_params()
+
+    return list(Recipes.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE ranked.row_number <= %s '
+        'ORDER BY ranked.author_id, ranked.row_number',
+        (*params, limit)
+    ))
+
+
+class ShoppingListLine(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        Ingredients,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    objects = ShoppingListLineManager()
+
+    class Meta:
+        unique_together = ('user', 'ingredient')
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Список покупок'
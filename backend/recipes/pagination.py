@@ -0,0 +1,7 @@
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = 100
@@ -0,0 +1,96 @@
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Favorite, RecipeRanking, Recipes, ShoppingCart
+
+
+RECIPE_RANKING_VERSION_CACHE_KEY = 'recipes:ranking:version'
+RANKINGS = ('popular', 'trending')
+EVENT_WEIGHTS = ((Favorite, 1.0), (ShoppingCart, 0.5))
+TRENDING_HALF_LIFE = timedelta(days=3)
+TRENDING_WINDOW = timedelta(days=30)
+BATCH_SIZE = 1000
+
+
+def bump_ranking_version():
+    cache.set(RECIPE_RANKING_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def ranking_version():
+    return cache.get(RECIPE_RANKING_VERSION_CACHE_KEY)
+
+
+def compute_rankings(now):
+    today = timezone.localdate(now)
+    popular = defaultdict(float)
+    trending = defaultdict(float)
+
+    for model, weight in EVENT_WEIGHTS:
+        for recipe_id, count in model.objects.order_by().values(
+            'recipe_id'
+        ).annotate(
+            count=Count('id')
+        ).values_list('recipe_id', 'count').iterator():
+            popular[recipe_id] += weight * count
+
+        for recipe_id, day, count in model.objects.filter(
+            created_at__gte=now - TRENDING_WINDOW
+        ).annotate(
+            day=TruncDate('created_at')
+        ).order_by().values('recipe_id', 'day').annotate(
+            count=Count('id')
+        ).values_list('recipe_id', 'day', 'count').iterator():
+            trending[recipe_id] += weight * count * 0.5 ** (
+                (today - day) / TRENDING_HALF_LIFE
+            )
+
+    return popular, trending
+
+
+def add_unranked_recipe(recipe_id):
+    RecipeRanking.objects.create(
+        recipe_id=recipe_id,
+        popular=0.0,
+        trending=0.0,
+        computed_at=timezone.now()
+    )
+
+
+@transaction.atomic
+def update_rankings(now=None):
+    now = now or timezone.now()
+    popular, trending = compute_rankings(now)
+    RecipeRanking.objects.all().delete()
+    RecipeRanking.objects.bulk_create(
+        (
+            RecipeRanking(
+                recipe_id=recipe_id,
+                popular=popular.get(recipe_id, 0.0),
+                trending=trending.get(recipe_id, 0.0),
+                computed_at=now
+            )
+            for recipe_id in Recipes.objects.values_list(
+                'id',
+                flat=True
+            ).iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    bump_ranking_version()
+    transaction.on_commit(bump_ranking_version)
+    return len(popular.keys() | trending.keys())
+
+
+def order_by_ranking(queryset, ranking):
+    return queryset.filter(ranking__isnull=False).order_by(
+        f'-ranking__{ranking}',
+        '-ranking__recipe_id'
+    )
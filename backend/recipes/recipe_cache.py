@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .catalog import get_catalog
+from .models import IngredientsInRecipe, Recipes
+from .single_flight import single_flight
+from tags.models import Tags
+
+
+SHORT_FIELDS = ('id', 'name', 'image', 'cooking_time')
+
+
+def recipe_cache_key(recipe_id, modified_at):
+    return f'recipes:representation:{recipe_id}:{modified_at.timestamp()}'
+
+
+def recipe_prefetches():
+    return (
+        Prefetch('tags', queryset=Tags.objects.all()),
+        Prefetch(
+            'ingredientsinrecipe_set',
+            queryset=(
+                IngredientsInRecipe.objects.all()
+                if get_catalog() is not None
+                else IngredientsInRecipe.objects.select_related('ingredient')
+            )
+        ),
+    )
+
+
+def get_cached_representations(recipes):
+    keys = {
+        recipe.id: recipe_cache_key(recipe.id, recipe.modified_at)
+        for recipe in recipes
+    }
+    cached = cache.get_many(list(keys.values()))
+    return {
+        recipe_id: cached[key]
+        for recipe_id, key in keys.items()
+        if key in cached
+    }
+
+
+def get_short_representations(recipe_ids):
+    return {
+        recipe.id: {
+            'id': recipe.id,
+            'name': recipe.name,
+            'image': recipe.image.url if recipe.image else None,
+            'cooking_time': recipe.cooking_time,
+        }
+        for recipe in Recipes.objects.filter(
+            id__in=recipe_ids
+        ).only(*SHORT_FIELDS)
+    }
+
+
+def get_or_build_representation(recipe, build):
+    return single_flight.get_or_set(
+        recipe_cache_key(recipe.id, recipe.modified_at),
+        build
+    )
+
+
+def touch_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+
+    if recipe_ids:
+        Recipes.objects.filter(id__in=recipe_ids).update(
+            modified_at=timezone.now()
+        )
+
+
+def touch_author_recipes(author_id):
+    touch_recipes(
+        Recipes.objects.filter(author_id=author_id).values_list(
+            'id',
+            flat=True
+        )
+    )
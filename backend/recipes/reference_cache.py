@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+
+import brotli
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .catalog import get_catalog
+from .single_flight import single_flight
+
+
+ENCODINGS = ('br', 'gzip')
+BROTLI_QUALITY = 5
+
+
+def build_entry(body):
+    return {
+        'etag': f'"{hashlib.sha1(body).hexdigest()}"',
+        'identity': body,
+        'gzip': gzip.compress(body, mtime=0),
+        'br': brotli.compress(body, quality=BROTLI_QUALITY),
+    }
+
+
+def choose_encoding(request):
+    accepted = {
+        value.split(';')[0].strip()
+        for value in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+    }
+
+    for encoding in ENCODINGS:
+        if encoding in accepted:
+            return encoding
+
+    return 'identity'
+
+
+class ReferenceCacheMixin:
+    version_cache_key = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            self.uncached_list,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            self.uncached_retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+    def uncached_list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def uncached_retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.query_params:
+            return handler(request, *args, **kwargs)
+
+        catalog = get_catalog()
+        path = hashlib.sha1(request.path.encode()).hexdigest()
+        key = (
+            f'reference:{cache.get(self.version_cache_key)}:'
+            f'{catalog.version if catalog is not None else None}:{path}'
+        )
+        response = None
+
+        def build():
+            nonlocal response
+            response = handler(request, *args, **kwargs)
+
+            if response.status_code != 200:
+                return None
+
+            return build_entry(JSONRenderer().render(response.data))
+
+        entry = single_flight.get_or_set(key, build)
+
+        if entry is None:
+            return response
+
+        if entry['etag'] in parse_etags(
+            request.META.get('HTTP_IF_NONE_MATCH', '')
+        ):
+            response = HttpResponseNotModified()
+        else:
+            encoding = choose_encoding(request)
+            response = HttpResponse(
+                entry[encoding],
+                content_type='application/json'
+            )
+
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+
+        response['ETag'] = entry['etag']
+        response['Vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,161 @@
+import re
+import threading
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (Case, F, FloatField, OuterRef, Subquery,
+                              Value, When)
+
+from .models import IngredientsInRecipe, Recipes
+
+
+RECIPES_SEARCH_VERSION_CACHE_KEY = 'recipes:search:version'
+SEARCH_CONFIG = 'russian'
+WEIGHTS = {'name': 1.0, 'ingredients': 0.4, 'text': 0.2}
+TOKEN_RE = re.compile(r'\w+')
+
+
+def uses_search_vector():
+    return connection.vendor == 'postgresql'
+
+
+def bump_search_version():
+    cache.set(RECIPES_SEARCH_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def recipe_search_vector():
+    ingredient_names = Subquery(
+        IngredientsInRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', delimiter=' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids=None):
+    if uses_search_vector():
+        recipes = Recipes.objects.all()
+
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+
+        recipes.update(search_vector=recipe_search_vector())
+
+    bump_search_version()
+
+
+def schedule_search_update(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    bump_search_version()
+    transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.casefold())
+
+
+class RecipeSearchIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = None
+
+    def get_state(self):
+        version = cache.get(RECIPES_SEARCH_VERSION_CACHE_KEY)
+        state = self.state
+
+        if state is not None and state[0] == version:
+            return state
+
+        with self.lock:
+            if self.state is not None and self.state[0] == version:
+                return self.state
+
+            postings = defaultdict(lambda: defaultdict(float))
+
+            for recipe_id, name, text in Recipes.objects.values_list(
+                'id',
+                'name',
+                'text'
+            ).iterator():
+                self.add(postings, recipe_id, WEIGHTS['name'], name)
+                self.add(postings, recipe_id, WEIGHTS['text'], text)
+
+            for recipe_id, name in IngredientsInRecipe.objects.values_list(
+                'recipe_id',
+                'ingredient__name'
+            ).iterator():
+                self.add(postings, recipe_id, WEIGHTS['ingredients'], name)
+
+            self.state = (version, sorted(postings), postings)
+            return self.state
+
+    def add(self, postings, recipe_id, weight, text):
+        for token in tokenize(text):
+            postings[token][recipe_id] += weight
+
+    def search(self, query):
+        _, tokens, postings = self.get_state()
+        scores = None
+
+        for term in tokenize(query):
+            term_scores = defaultdict(float)
+            position = bisect_left(tokens, term)
+
+            while (position < len(tokens)
+                   and tokens[position].startswith(term)):
+                for recipe_id, weight in postings[tokens[position]].items():
+                    term_scores[recipe_id] += weight
+                position += 1
+
+            scores = term_scores if scores is None else {
+                recipe_id: score + term_scores[recipe_id]
+                for recipe_id, score in scores.items()
+                if recipe_id in term_scores
+            }
+
+        return scores or {}
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, text):
+    if uses_search_vector():
+        query = SearchQuery(
+            text,
+            config=SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+    else:
+        scores = recipe_search_index.search(text)
+
+        if not scores:
+            return queryset.none()
+
+        queryset = queryset.filter(id__in=scores).annotate(
+            search_rank=Case(
+                *(
+                    When(id=recipe_id, then=Value(score))
+                    for recipe_id, score in scores.items()
+                ),
+                output_field=FloatField()
+            )
+        )
+
+    return queryset.order_by('-search_rank', '-id')
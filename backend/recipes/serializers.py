@@ -1,13 +1,22 @@
 import base64
+from collections.abc import Mapping
 
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
 
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
 
+from .catalog import get_catalog
 from .models import (Recipes, Ingredients, RecipeTags, IngredientsInRecipe,
-                     Favorite, ShoppingCart)
+                     Favorite, ShoppingCart, ShoppingListLine)
+from .recipe_cache import (get_cached_representations,
+                           get_or_build_representation, recipe_prefetches)
 from tags.models import Tags
-from users.serializers import CustomUserSerializer, CustomUserProfileSerializer
+from users.models import Followers
+from users.serializers import CustomUserProfileSerializer
 
 
 class Base64ImageField(serializers.ImageField):
@@ -20,6 +29,75 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+
+    objects = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            raise ValueError
+
+    def prefetch(self, data):
+        pks = set()
+
+        for value in data:
+            try:
+                pks.add(self.to_pk(value))
+            except (TypeError, ValueError):
+                pass
+
+        self.objects = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.objects is None or self.pk_field is not None:
+            return super().to_internal_value(data)
+
+        try:
+            instance = self.objects.get(self.to_pk(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+
+        return instance
+
+
+class BulkManyRelatedField(ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) and hasattr(data, '__iter__'):
+            self.child_relation.prefetch(data)
+
+        return super().to_internal_value(data)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            for name, field in self.child.fields.items():
+                if isinstance(field, BulkPrimaryKeyRelatedField):
+                    field.prefetch(
+                        item[name] for item in data
+                        if isinstance(item, Mapping) and name in item
+                    )
+
+        return super().to_internal_value(data)
+
+
 class RecipeTagsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tags
@@ -47,24 +125,53 @@ class IngredientsInRecipeSerializer(serializers.ModelSerializer):
         model = IngredientsInRecipe
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
+    def to_representation(self, instance):
+        catalog = get_catalog()
+        ingredient = (
+            catalog.ingredient(instance.ingredient_id)
+            if catalog is not None else None
+        )
+
+        if ingredient is None:
+            return super().to_representation(instance)
+
+        return {**ingredient, 'amount': instance.amount}
+
 
 class AddIngredientToRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredients.objects.all()
     )
 
     class Meta:
         model = IngredientsInRecipe
         fields = ('id', 'amount')
+        list_serializer_class = BulkListSerializer
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        cached = get_cached_representations(recipes)
+        prefetch_related_objects(
+            [recipe for recipe in recipes if recipe.id not in cached],
+            *recipe_prefetches()
+        )
+
+        for recipe in recipes:
+            recipe.cached_representation = cached.get(recipe.id)
+
+        return super().to_representation(recipes)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Tags.objects.all()
     )
-    author = CustomUserSerializer(read_only=True)
-    ingredients = AddIngredientToRecipeSerializer(many=True)
+    author = serializers.PrimaryKeyRelatedField(read_only=True)
+    ingredients = AddIngredientToRecipeSerializer(many=True, write_only=True)
     image = Base64ImageField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -85,8 +192,26 @@ class RecipeSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time'
         )
+        list_serializer_class = RecipeListSerializer
+
+    def get_author_is_subscribed(self, obj):
+        if hasattr(obj, 'author_is_subscribed'):
+            return obj.author_is_subscribed
+
+        request = self.context.get('request')
+
+        if request is not None and request.user.is_authenticated:
+            return Followers.objects.filter(
+                follower=request.user,
+                following_id=obj.author_id
+            ).exists()
+        else:
+            return False
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+
         request = self.context.get('request')
 
         if request is not None and request.user.is_anonymous is False:
@@ -98,6 +223,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+
         request = self.context.get('request')
 
         if request is not None and request.user.is_anonymous is False:
@@ -108,61 +236,141 @@ class RecipeSerializer(serializers.ModelSerializer):
         else:
             return False
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags', [])
         recipe = Recipes.objects.create(**validated_data)
-        recipe.tags.set(tags_data)
-
-        for ingredient in ingredients_data:
-            ingredient_id = ingredient['id']
-            ingredient_amount = ingredient['amount']
-            IngredientsInRecipe.objects.create(
-                ingredient=ingredient_id,
+        RecipeTags.objects.bulk_create(
+            RecipeTags(recipe=recipe, tag=tag) for tag in tags_data
+        )
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(
+                ingredient=ingredient['id'],
                 recipe=recipe,
-                amount=ingredient_amount
+                amount=ingredient['amount']
             )
+            for ingredient in ingredients_data
+        )
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags', [])
-        RecipeTags.objects.filter(recipe=instance).delete()
-        IngredientsInRecipe.objects.filter(recipe=instance).delete()
-
-        for ingredient in ingredients_data:
-            ingredient_id = ingredient['id']
-            ingredient_amount = ingredient['amount']
-            IngredientsInRecipe.objects.create(
-                ingredient=ingredient_id,
-                recipe=instance,
-                amount=ingredient_amount
-            )
+        amounts = self.update_ingredients(instance, ingredients_data)
+        self.update_tags(instance, tags_data)
+
         instance.name = validated_data.pop('name')
         instance.text = validated_data.pop('text')
         if validated_data.get('image') is not None:
             instance.image = validated_data.pop('image')
         instance.cooking_time = validated_data.pop('cooking_time')
-        instance.tags.set(tags_data)
         instance.save()
 
+        ShoppingListLine.objects.apply_amounts(
+            ShoppingCart.objects.filter(
+                recipe=instance
+            ).values_list('user_id', flat=True),
+            amounts
+        )
+
         return instance
 
+    def update_ingredients(self, instance, ingredients_data):
+        current = {
+            ingredient_in_recipe.ingredient_id: ingredient_in_recipe
+            for ingredient_in_recipe in IngredientsInRecipe.objects.filter(
+                recipe=instance
+            )
+        }
+        requested = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients_data
+        }
+        amounts = {}
+        new_rows, changed_rows = [], []
+
+        for ingredient_id, amount in requested.items():
+            row = current.get(ingredient_id)
+
+            if row is None:
+                new_rows.append(IngredientsInRecipe(
+                    ingredient_id=ingredient_id,
+                    recipe=instance,
+                    amount=amount
+                ))
+                amounts[ingredient_id] = amount
+            elif row.amount != amount:
+                amounts[ingredient_id] = amount - row.amount
+                row.amount = amount
+                changed_rows.append(row)
+
+        removed_ids = []
+
+        for ingredient_id, row in current.items():
+            if ingredient_id not in requested:
+                removed_ids.append(row.id)
+                amounts[ingredient_id] = -row.amount
+
+        if removed_ids:
+            IngredientsInRecipe.objects.filter(id__in=removed_ids).delete()
+        IngredientsInRecipe.objects.bulk_create(new_rows)
+        IngredientsInRecipe.objects.bulk_update(changed_rows, ['amount'])
+
+        return amounts
+
+    def update_tags(self, instance, tags_data):
+        current = set(
+            RecipeTags.objects.filter(
+                recipe=instance
+            ).values_list('tag_id', flat=True)
+        )
+        requested = {tag.id for tag in tags_data}
+
+        if current - requested:
+            RecipeTags.objects.filter(
+                recipe=instance,
+                tag_id__in=current - requested
+            ).delete()
+        RecipeTags.objects.bulk_create(
+            RecipeTags(recipe=instance, tag_id=tag_id)
+            for tag_id in requested - current
+        )
+
     def to_representation(self, instance):
+        representation = getattr(instance, 'cached_representation', None)
+
+        if representation is None:
+            representation = get_or_build_representation(
+                instance,
+                lambda: self.build_representation(instance)
+            )
+
+        representation = dict(representation)
+        representation['author'] = {
+            **representation['author'],
+            'is_subscribed': self.get_author_is_subscribed(instance)
+        }
+        representation['is_favorited'] = self.get_is_favorited(instance)
+        representation['is_in_shopping_cart'] = (
+            self.get_is_in_shopping_cart(instance)
+        )
+
+        return representation
+
+    def build_representation(self, instance):
+        prefetch_related_objects([instance], *recipe_prefetches())
         representation = super().to_representation(instance)
         representation['tags'] = RecipeTagsSerializer(
-            instance.tags.all(),
             many=True
-        ).data
+        ).to_representation(instance.tags.all())
         representation['author'] = CustomUserProfileSerializer(
-            instance.author
-        ).data
-        ingredients = IngredientsInRecipe.objects.filter(recipe=instance)
+        ).to_representation(instance.author)
         representation['ingredients'] = IngredientsInRecipeSerializer(
-            ingredients,
             many=True
-        ).data
+        ).to_representation(instance.ingredientsinrecipe_set.all())
 
         if instance.image:
             representation['image'] = instance.image.url
@@ -213,6 +421,22 @@ class RecipeSerializer(serializers.ModelSerializer):
         return data
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
+class IngredientIdsSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
 class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
@@ -223,17 +447,10 @@ class FavoriteSerializer(serializers.ModelSerializer):
             'id': instance.recipe.id,
             'name': instance.recipe.name,
             'image': (instance.recipe.image.url
-                      if instance.recipe.image.url else None),
+                      if instance.recipe.image else None),
             'cooking_time': instance.recipe.cooking_time
         }
 
-    def validate(self, data):
-        user = data['user']
-        recipe = data['recipe']
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError('Рецепт уже в избранном.')
-        return data
-
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .catalog import refresh_catalog
+from .ingredient_index import bump_ingredients_version
+from .conditional import touch_viewer
+from .counters import change_counters
+from .coverage_index import schedule_coverage_update
+from .facets import schedule_facets_update
+from .models import (Favorite, Ingredients, IngredientsInRecipe, Recipes,
+                     RecipeTags, ShoppingCart, ShoppingListLine)
+from .rankings import add_unranked_recipe
+from .recipe_cache import touch_author_recipes, touch_recipes
+from .search import schedule_search_update
+from tags.models import Tags
+from users.models import Followers
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def clear_ingredient_index(**kwargs):
+    bump_ingredients_version()
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+def rebuild_catalog(**kwargs):
+    transaction.on_commit(refresh_catalog)
+
+
+@receiver(pre_delete, sender=Recipes)
+def remove_recipe_from_shopping_lists(instance, **kwargs):
+    ShoppingListLine.objects.remove_recipe_from_carts(instance.id)
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+def refresh_search_vector(instance, **kwargs):
+    schedule_search_update([instance.id])
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+def refresh_coverage_index(**kwargs):
+    schedule_coverage_update()
+
+
+@receiver(post_save, sender=Recipes)
+def add_recipe_ranking(instance, created, **kwargs):
+    if created:
+        add_unranked_recipe(instance.id)
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+@receiver(post_save, sender=RecipeTags)
+@receiver(post_delete, sender=RecipeTags)
+def refresh_facets(**kwargs):
+    schedule_facets_update()
+
+
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+@receiver(post_save, sender=RecipeTags)
+@receiver(post_delete, sender=RecipeTags)
+def touch_recipe_rows(instance, **kwargs):
+    touch_recipes([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(pre_delete, sender=Ingredients)
+def touch_ingredient_recipes(instance, created=False, **kwargs):
+    if not created:
+        recipe_ids = list(
+            IngredientsInRecipe.objects.filter(
+                ingredient=instance
+            ).values_list('recipe_id', flat=True)
+        )
+        touch_recipes(recipe_ids)
+        schedule_search_update(recipe_ids)
+        schedule_coverage_update()
+
+
+@receiver(post_save, sender=Tags)
+@receiver(pre_delete, sender=Tags)
+def touch_tag_recipes(instance, created=False, **kwargs):
+    if not created:
+        touch_recipes(
+            RecipeTags.objects.filter(
+                tag=instance
+            ).values_list('recipe_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=User)
+def touch_user_recipes(instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+
+    touch_author_recipes(instance.id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def touch_recipe_list_viewer(instance, **kwargs):
+    touch_viewer(instance.user_id)
+
+
+@receiver(post_save, sender=Followers)
+@receiver(post_delete, sender=Followers)
+def touch_follower(instance, **kwargs):
+    touch_viewer(instance.follower_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Recipes)
+@receiver(post_save, sender=Followers)
+def increment_counters(instance, created, **kwargs):
+    if created:
+        change_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Recipes)
+@receiver(post_delete, sender=Followers)
+def decrement_counters(instance, **kwargs):
+    change_counters(instance, -1)
@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .coverage_index import (RECIPE_INGREDIENTS_VERSION_CACHE_KEY,
+                             load_recipe_ingredients,
+                             recipe_ingredient_changes, recipes_synced_at)
+from .models import Recipes
+
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+PRIME = (1 << 31) - 1
+CHUNK_SIZE = 10000
+CHECK_INTERVAL = 1.0
+
+random_state = np.random.RandomState(20241018)
+HASH_A = random_state.randint(1, PRIME, NUM_HASHES).astype(np.int64)
+HASH_B = random_state.randint(0, PRIME, NUM_HASHES).astype(np.int64)
+BAND_MULTIPLIERS = (
+    random_state.randint(1, 1 << 62, ROWS, dtype=np.int64).astype(np.uint64)
+    | np.uint64(1)
+)
+
+
+def minhash_signatures(recipe_ingredients):
+    recipe_ids = np.array(
+        sorted(
+            recipe_id for recipe_id, ingredient_ids
+            in recipe_ingredients.items()
+            if ingredient_ids
+        ),
+        dtype=np.int64
+    )
+    signatures = np.empty((len(recipe_ids), NUM_HASHES), dtype=np.uint32)
+
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        chunk = [
+            recipe_ingredients[recipe_id]
+            for recipe_id in recipe_ids[start:start + CHUNK_SIZE].tolist()
+        ]
+        ingredient_ids = np.fromiter(
+            (ingredient_id for row in chunk for ingredient_id in row),
+            dtype=np.int64
+        )
+        offsets = np.cumsum([0] + [len(row) for row in chunk[:-1]])
+        hashes = (ingredient_ids[:, None] * HASH_A + HASH_B) % PRIME
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(
+            hashes,
+            offsets,
+            axis=0
+        )
+
+    return recipe_ids, signatures
+
+
+def band_keys(signatures):
+    bands = signatures.reshape(len(signatures), BANDS, ROWS)
+    return (bands.astype(np.uint64) * BAND_MULTIPLIERS).sum(
+        axis=2,
+        dtype=np.uint64
+    )
+
+
+def write_similarity_index(path=None):
+    path = path or settings.SIMILARITY_INDEX_FILE
+    synced_at = datetime.now(timezone.utc)
+    recipe_ids, signatures = minhash_signatures(
+        load_recipe_ingredients(Recipes.objects.all())
+    )
+    temp_path = f'{path}.{os.getpid()}.tmp'
+
+    with open(temp_path, 'wb') as file:
+        np.savez(
+            file,
+            recipe_ids=recipe_ids,
+            signatures=signatures,
+            synced_at=np.array([synced_at.timestamp()])
+        )
+
+    os.replace(temp_path, path)
+    return len(recipe_ids)
+
+
+class SimilarityState:
+
+    def __init__(self, version, synced_at, recipe_ids, signatures,
+                 inode=None):
+        self.version = version
+        self.synced_at = synced_at
+        self.inode = inode
+        self.recipe_ids = recipe_ids
+        self.signatures = signatures
+        keys = band_keys(signatures).T
+        self.band_order = np.argsort(keys, axis=1, kind='stable')
+        self.band_keys = np.take_along_axis(keys, self.band_order, axis=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            inode = os.fstat(file.fileno()).st_ino
+            data = np.load(file)
+
+            return cls(
+                None,
+                datetime.fromtimestamp(
+                    data['synced_at'][0],
+                    timezone.utc
+                ),
+                data['recipe_ids'],
+                data['signatures'],
+                inode
+            )
+
+    def patch(self, version, synced_at, changes):
+        recipe_ids, signatures = minhash_signatures(changes)
+        keep = ~np.isin(self.recipe_ids, list(changes))
+        recipe_ids = np.concatenate((self.recipe_ids[keep], recipe_ids))
+        signatures = np.concatenate((self.signatures[keep], signatures))
+        order = np.argsort(recipe_ids, kind='stable')
+
+        return SimilarityState(
+            version,
+            synced_at,
+            recipe_ids[order],
+            signatures[order],
+            self.inode
+        )
+
+    def similar(self, recipe_id, limit):
+        position = np.searchsorted(self.recipe_ids, recipe_id)
+
+        if (position == len(self.recipe_ids)
+                or self.recipe_ids[position] != recipe_id):
+            return None
+
+        signature = self.signatures[position]
+        keys = band_keys(signature[None, :])[0]
+        candidates = np.unique(np.concatenate([
+            self.band_order[band, np.searchsorted(
+                self.band_keys[band],
+                keys[band],
+                'left'
+            ):np.searchsorted(self.band_keys[band], keys[band], 'right')]
+            for band in range(BANDS)
+        ]))
+        candidates = candidates[candidates != position]
+        similarity = (self.signatures[candidates] == signature).mean(axis=1)
+        order = np.lexsort((self.recipe_ids[candidates], -similarity))
+
+        return [
+            (int(self.recipe_ids[candidate]), float(similarity[index]))
+            for index, candidate in zip(order[:limit], candidates[order])
+        ]
+
+
+class SimilarityIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = None
+        self.checked_at = None
+
+    def get_state(self):
+        version = cache.get(RECIPE_INGREDIENTS_VERSION_CACHE_KEY)
+        now = time.monotonic()
+        state = self.state
+
+        if (self.checked_at is not None
+                and now - self.checked_at < CHECK_INTERVAL
+                and (state is None or state.version == version)):
+            return state
+
+        with self.lock:
+            self.checked_at = now
+
+            try:
+                inode = os.stat(settings.SIMILARITY_INDEX_FILE).st_ino
+            except FileNotFoundError:
+                self.state = None
+                return None
+
+            state = self.state
+            reloaded = state is None or state.inode != inode
+
+            if reloaded:
+                state = SimilarityState.load(settings.SIMILARITY_INDEX_FILE)
+
+            if reloaded or state.version != version:
+                state = state.patch(
+                    version,
+                    recipes_synced_at() or state.synced_at,
+                    recipe_ingredient_changes(
+                        state.synced_at,
+                        state.recipe_ids.tolist()
+                    )
+                )
+
+            self.state = state
+            return state
+
+    def reset(self):
+        with self.lock:
+            self.state = None
+            self.checked_at = None
+
+    def similar(self, recipe_id, limit):
+        state = self.get_state()
+
+        if state is None:
+            return None
+
+        return state.similar(recipe_id, limit)
+
+
+similarity_index = SimilarityIndex()
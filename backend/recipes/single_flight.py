@@ -0,0 +1,85 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+
+LEASE_TIMEOUT = 10
+WAIT_TIMEOUT = 5
+POLL_INTERVAL = 0.05
+
+
+class Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def get_or_set(self, key, build):
+        value = cache.get(key)
+
+        if value is not None:
+            return value
+
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self.calls[key] = Call()
+
+        if not leader:
+            call.done.wait(WAIT_TIMEOUT)
+            return call.value if call.value is not None else build()
+
+        try:
+            call.value = self.build_once(key, build)
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.value
+
+    def build_once(self, key, build):
+        lease_key = f'{key}:lease'
+        deadline = time.monotonic() + WAIT_TIMEOUT
+
+        while not cache.add(lease_key, True, LEASE_TIMEOUT):
+            value = cache.get(key)
+
+            if value is not None:
+                return value
+
+            if time.monotonic() >= deadline:
+                return self.build_and_set(key, build)
+
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            value = cache.get(key)
+
+            if value is None:
+                value = self.build_and_set(key, build)
+
+            return value
+        finally:
+            cache.delete(lease_key)
+
+    def build_and_set(self, key, build):
+        value = build()
+
+        if value is not None:
+            cache.set(key, value)
+
+        return value
+
+
+single_flight = SingleFlight()
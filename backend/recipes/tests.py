@@ -0,0 +1,1534 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+
+from rest_framework.test import (APIClient, APITestCase,
+                                 APITransactionTestCase)
+
+from .catalog import catalog_loader
+from .coverage_index import coverage_index
+from .ingredient_index import bump_ingredients_version
+from .models import (Recipes, Ingredients, IngredientsInRecipe, RecipeTags,
+                     Favorite, ShoppingCart, ShoppingListLine)
+from .recipe_cache import recipe_cache_key
+from .search import bump_search_version
+from .similarity import similarity_index
+from .single_flight import SingleFlight
+from .views import BulkFavoriteView
+from tags.models import Tags
+
+
+User = get_user_model()
+
+
+class RecipeListQueriesTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Рецептов',
+            password='password'
+        )
+        cls.viewer = User.objects.create_user(
+            email='viewer@foodgram.ru',
+            username='viewer',
+            first_name='Читатель',
+            last_name='Рецептов',
+            password='password'
+        )
+        cls.tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredients.objects.create(
+            name='Мука',
+            measurement_unit='г'
+        )
+
+        for number in range(8):
+            recipe = Recipes.objects.create(
+                author=cls.author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set([cls.tag])
+            IngredientsInRecipe.objects.create(
+                recipe=recipe,
+                ingredient=cls.ingredient,
+                amount=100
+            )
+            Favorite.objects.create(user=cls.viewer, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.viewer, recipe=recipe)
+
+    def count_list_queries(self, client):
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 6)
+        return len(context), response
+
+    def test_flags_do_not_add_queries_per_recipe(self):
+        anonymous_queries, response = self.count_list_queries(APIClient())
+
+        for recipe in response.data['results']:
+            self.assertFalse(recipe['is_favorited'])
+            self.assertFalse(recipe['is_in_shopping_cart'])
+
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        viewer_queries, response = self.count_list_queries(client)
+
+        for recipe in response.data['results']:
+            self.assertTrue(recipe['is_favorited'])
+            self.assertTrue(recipe['is_in_shopping_cart'])
+
+        self.assertEqual(viewer_queries, anonymous_queries)
+
+    def test_queries_do_not_depend_on_ingredients_count(self):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        queries, _ = self.count_list_queries(client)
+
+        ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {number}',
+                measurement_unit='г'
+            )
+            for number in range(15)
+        ]
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(recipe=recipe, ingredient=ingredient)
+            for recipe in Recipes.objects.all()
+            for ingredient in ingredients
+        )
+
+        self.assertEqual(self.count_list_queries(client)[0], queries)
+        self.assertLessEqual(queries, 5)
+
+        response = client.get(self.url)
+        self.assertEqual(len(response.data['results'][0]['ingredients']), 16)
+
+    def test_cached_representations(self):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        self.count_list_queries(client)
+
+        with self.assertNumQueries(3):
+            response = client.get(self.url)
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+
+        response = self.client.get(self.url)
+        self.assertFalse(response.data['results'][0]['is_favorited'])
+
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.data['results'][0]['author']['first_name'],
+            'Новое имя'
+        )
+
+    def test_late_cache_write_is_not_served(self):
+        recipe = Recipes.objects.latest('id')
+        self.client.get(self.url)
+        stale_key = recipe_cache_key(recipe.id, recipe.modified_at)
+        stale = cache.get(stale_key)
+        self.assertIsNotNone(stale)
+        recipe.name = 'Новое название'
+        recipe.save()
+        cache.set(stale_key, stale)
+
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.data['results'][0]['name'],
+            'Новое название'
+        )
+
+    def test_multiple_tags_return_each_recipe_once(self):
+        lunch = Tags.objects.create(name='Обед', slug='lunch')
+
+        for recipe in Recipes.objects.all():
+            recipe.tags.add(lunch)
+
+        response = self.client.get(
+            self.url,
+            {'tags': ['breakfast', 'lunch']}
+        )
+        self.assertEqual(response.data['count'], 8)
+
+        response = self.client.get(self.url, {'tags': 'dinner'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        recipe_ids = list(
+            Recipes.objects.order_by('-id').values_list('id', flat=True)
+        )
+
+        response = self.client.get(self.url, {'pagination': 'cursor'})
+        self.assertNotIn('count', response.data)
+        first_page = [recipe['id'] for recipe in response.data['results']]
+
+        response = self.client.get(response.data['next'])
+        second_page = [recipe['id'] for recipe in response.data['results']]
+
+        self.assertEqual(first_page + second_page, recipe_ids)
+        self.assertIsNone(response.data['next'])
+
+
+class DownloadShoppingCartQueriesTest(APITestCase):
+    url = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@foodgram.ru',
+            username='cook',
+            first_name='Повар',
+            last_name='Поваров',
+            password='password'
+        )
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {number}',
+                measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def add_recipes_to_cart(self, count):
+        for number in range(count):
+            recipe = Recipes.objects.create(
+                author=self.user,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10
+            )
+            IngredientsInRecipe.objects.bulk_create(
+                IngredientsInRecipe(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=10
+                )
+                for ingredient in self.ingredients
+            )
+            response = self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, 201)
+
+    def download(self, export_format='txt'):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {'format': export_format})
+            self.assertEqual(response.status_code, 200)
+            content = b''.join(response.streaming_content).decode()
+
+        return len(context), content
+
+    def test_queries_do_not_grow_with_cart(self):
+        self.add_recipes_to_cart(1)
+        small_cart_queries, content = self.download()
+        self.assertIn('Ингредиент 0 (г): 10\n', content)
+
+        self.add_recipes_to_cart(40)
+        large_cart_queries, content = self.download()
+        self.assertIn('Ингредиент 0 (г): 410\n', content)
+
+        self.assertEqual(large_cart_queries, small_cart_queries)
+
+    def test_export_formats(self):
+        self.add_recipes_to_cart(2)
+
+        _, content = self.download('csv')
+        self.assertEqual(
+            content.splitlines()[:2],
+            ['name,measurement_unit,amount', 'Ингредиент 0,г,20']
+        )
+
+        _, content = self.download('json')
+        self.assertEqual(
+            json.loads(content)[0],
+            {'name': 'Ингредиент 0', 'measurement_unit': 'г', 'amount': 20}
+        )
+
+        response = self.client.get(self.url, {'format': 'xls'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ShoppingListLineTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Рецептов',
+            password='password'
+        )
+        cls.buyer = User.objects.create_user(
+            email='buyer@foodgram.ru',
+            username='buyer',
+            first_name='Покупатель',
+            last_name='Продуктов',
+            password='password'
+        )
+        cls.tag = Tags.objects.create(name='Обед', slug='lunch')
+        cls.flour, cls.sugar, cls.salt = (
+            Ingredients.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Сахар', 'Соль')
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+        self.recipe = self.create_recipe({self.flour: 100, self.sugar: 50})
+        self.client.force_authenticate(self.buyer)
+        self.client.post(f'/api/recipes/{self.recipe.id}/shopping_cart/')
+
+    def create_recipe(self, amounts):
+        recipe = Recipes.objects.create(
+            author=self.author,
+            name='Пирог',
+            text='Описание',
+            cooking_time=30
+        )
+        recipe.tags.set([self.tag])
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(recipe=recipe, ingredient=ingredient,
+                                amount=amount)
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def shopping_list(self):
+        return dict(
+            ShoppingListLine.objects.filter(
+                user=self.buyer
+            ).values_list('ingredient__name', 'total_amount')
+        )
+
+    def test_cart_changes_update_lines(self):
+        other_recipe = self.create_recipe({self.flour: 30})
+        self.client.post(f'/api/recipes/{other_recipe.id}/shopping_cart/')
+        self.assertEqual(self.shopping_list(), {'Мука': 130, 'Сахар': 50})
+
+        self.client.delete(f'/api/recipes/{self.recipe.id}/shopping_cart/')
+        self.assertEqual(self.shopping_list(), {'Мука': 30})
+
+    def test_line_error_is_not_reported_as_duplicate(self):
+        other_recipe = self.create_recipe({self.salt: 5})
+
+        with mock.patch.object(
+            ShoppingListLine.objects,
+            'add_recipes',
+            side_effect=IntegrityError
+        ):
+            with self.assertRaises(IntegrityError):
+                self.client.post(
+                    f'/api/recipes/{other_recipe.id}/shopping_cart/'
+                )
+
+        self.assertFalse(
+            ShoppingCart.objects.filter(recipe=other_recipe).exists()
+        )
+
+    def test_recipe_edit_updates_lines(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {
+                'name': 'Пирог',
+                'text': 'Описание',
+                'cooking_time': 30,
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.flour.id, 'amount': 120},
+                    {'id': self.salt.id, 'amount': 5},
+                ]
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.shopping_list(), {'Мука': 120, 'Соль': 5})
+
+        self.client.delete(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_cascade_deletes_update_lines(self):
+        other_recipe = self.create_recipe({self.flour: 30, self.salt: 2})
+        self.client.post(f'/api/recipes/{other_recipe.id}/shopping_cart/')
+        other_recipe.delete()
+        self.assertEqual(self.shopping_list(), {'Мука': 100, 'Сахар': 50})
+
+        self.author.delete()
+        self.assertFalse(ShoppingCart.objects.filter(user=self.buyer))
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_rebuild_command_repairs_drift(self):
+        ShoppingListLine.objects.filter(ingredient=self.flour).update(
+            total_amount=1
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_shopping_lists', '--check')
+
+        call_command('rebuild_shopping_lists')
+        call_command('rebuild_shopping_lists', '--check')
+        self.assertEqual(self.shopping_list(), {'Мука': 100, 'Сахар': 50})
+
+    def test_bulk_cart_endpoint(self):
+        other_recipe = self.create_recipe({self.flour: 30, self.salt: 2})
+        url = '/api/recipes/shopping_cart/'
+
+        response = self.client.post(
+            url,
+            {'recipes': [self.recipe.id, other_recipe.id, 999]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.data['recipes']],
+            ['already_added', 'added', 'not_found']
+        )
+        self.assertEqual(
+            self.shopping_list(),
+            {'Мука': 130, 'Сахар': 50, 'Соль': 2}
+        )
+
+        response = self.client.delete(
+            url,
+            {'recipes': [self.recipe.id, other_recipe.id]},
+            format='json'
+        )
+        self.assertEqual(
+            [result['status'] for result in response.data['recipes']],
+            ['removed', 'removed']
+        )
+        self.assertFalse(ShoppingCart.objects.filter(user=self.buyer))
+        self.assertEqual(self.shopping_list(), {})
+
+        response = self.client.post(
+            url,
+            {'recipes': list(range(1, 102))},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RecipeWriteQueriesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Рецептов',
+            password='password'
+        )
+        cls.tags = [
+            Tags.objects.create(name=f'Тег {number}', slug=f'tag-{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {number}',
+                measurement_unit='г'
+            )
+            for number in range(30)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def recipe_data(self, ingredients, tags, name='Рецепт'):
+        return {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAAB'
+                     'CAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5E'
+                     'rkJggg==',
+            'tags': [tag.id for tag in tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in ingredients
+            ]
+        }
+
+    def edit_queries(self, ingredients_count):
+        ingredients = [
+            (ingredient, 10)
+            for ingredient in self.ingredients[:ingredients_count]
+        ]
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data(ingredients, self.tags[:2]),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        recipe_id = response.data['id']
+        row_ids = set(
+            IngredientsInRecipe.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('id', flat=True)
+        )
+
+        data = self.recipe_data(ingredients, self.tags[:2], name='Новое')
+        del data['image']
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                f'/api/recipes/{recipe_id}/',
+                data,
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(
+                IngredientsInRecipe.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list('id', flat=True)
+            ),
+            row_ids
+        )
+        return context.captured_queries
+
+    def test_unchanged_rows_are_not_written(self):
+        queries = self.edit_queries(25)
+        writes = [
+            query['sql'] for query in queries
+            if not query['sql'].startswith('SELECT')
+        ]
+
+        self.assertEqual(len(queries), len(self.edit_queries(5)))
+        self.assertFalse([
+            sql for sql in writes
+            if 'recipes_ingredientsinrecipe' in sql
+            or 'recipes_recipetags' in sql
+        ])
+        self.assertFalse([sql for sql in writes if 'search_vector' in sql])
+
+    def test_edit_applies_diff(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data(
+                [(ingredient, 10) for ingredient in self.ingredients[:3]],
+                self.tags[:2]
+            ),
+            format='json'
+        )
+        recipe_id = response.data['id']
+        kept_row = IngredientsInRecipe.objects.get(
+            recipe_id=recipe_id,
+            ingredient=self.ingredients[0]
+        )
+
+        data = self.recipe_data(
+            [
+                (self.ingredients[0], 10),
+                (self.ingredients[1], 20),
+                (self.ingredients[3], 30),
+            ],
+            self.tags[1:]
+        )
+        del data['image']
+        response = self.client.patch(
+            f'/api/recipes/{recipe_id}/',
+            data,
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [
+                (ingredient['id'], ingredient['amount'])
+                for ingredient in response.data['ingredients']
+            ],
+            [
+                (self.ingredients[0].id, 10),
+                (self.ingredients[1].id, 20),
+                (self.ingredients[3].id, 30),
+            ]
+        )
+        self.assertEqual(
+            [tag['id'] for tag in response.data['tags']],
+            [tag.id for tag in self.tags[1:]]
+        )
+        self.assertTrue(
+            IngredientsInRecipe.objects.filter(id=kept_row.id).exists()
+        )
+
+
+class IngredientSearchTest(APITestCase):
+    url = '/api/ingredients/'
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Сахарная пудра', 'сахар', 'Ванильный сахар', 'Соль'):
+            Ingredients.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        bump_ingredients_version()
+
+    def search(self, params):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, params)
+
+        return [
+            ingredient['name'] for ingredient in json.loads(response.content)
+        ]
+
+    def test_prefix_matches_come_before_substring_matches(self):
+        self.client.get(self.url, {'name': 'warm-up'})
+
+        self.assertEqual(
+            self.search({'name': 'САХ'}),
+            ['сахар', 'Сахарная пудра', 'Ванильный сахар']
+        )
+        self.assertEqual(
+            self.search({'name': 'сах', 'limit': 1}),
+            ['сахар']
+        )
+
+    def test_index_is_rebuilt_after_changes(self):
+        self.client.get(self.url, {'name': 'warm-up'})
+        Ingredients.objects.create(name='Сахарин', measurement_unit='г')
+
+        response = self.client.get(self.url, {'name': 'сахари'})
+        self.assertEqual(
+            [
+                ingredient['name']
+                for ingredient in json.loads(response.content)
+            ],
+            ['Сахарин']
+        )
+
+
+class CatalogTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tags.objects.create(name='Ужин', slug='dinner')
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {number}',
+                measurement_unit='шт'
+            )
+            for number in range(10)
+        ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            CATALOG_FILE=os.path.join(directory.name, 'catalog.bin')
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(catalog_loader.reset)
+        call_command('build_catalog')
+        catalog_loader.reset()
+
+    def test_reference_endpoints_do_not_query_db(self):
+        with self.assertNumQueries(0):
+            tags = json.loads(self.client.get('/api/tags/').content)
+            ingredient = json.loads(self.client.get(
+                f'/api/ingredients/{self.ingredients[3].id}/'
+            ).content)
+
+        self.assertEqual(
+            tags,
+            [{'id': self.tag.id, 'name': 'Ужин', 'slug': 'dinner'}]
+        )
+        self.assertEqual(
+            ingredient,
+            {
+                'id': self.ingredients[3].id,
+                'name': 'Ингредиент 3',
+                'measurement_unit': 'шт'
+            }
+        )
+
+    def test_catalog_responses_are_cached(self):
+        for url in (
+            '/api/tags/',
+            '/api/ingredients/',
+            f'/api/ingredients/{self.ingredients[3].id}/',
+        ):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+
+            with self.assertNumQueries(0):
+                response = self.client.get(
+                    url,
+                    HTTP_IF_NONE_MATCH=response['ETag']
+                )
+            self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            '/api/ingredients/?name=Ингредиент',
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_rebuild_is_picked_up(self):
+        version = catalog_loader.get().version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tags.objects.create(name='Обед', slug='lunch')
+
+        catalog_loader.reset()
+        catalog = catalog_loader.get()
+        self.assertGreater(catalog.version, version)
+        self.assertEqual(len(catalog.tags()), 2)
+
+
+class ReferenceCacheTest(APITestCase):
+    url = '/api/tags/'
+
+    @classmethod
+    def setUpTestData(cls):
+        Tags.objects.create(name='Завтрак', slug='breakfast')
+
+    def test_cached_bytes_and_conditional_get(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content)),
+            [{'id': Tags.objects.get().id, 'name': 'Завтрак',
+              'slug': 'breakfast'}]
+        )
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Tags.objects.create(name='Обед', slug='lunch')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+    def test_long_urls_make_valid_cache_keys(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            response = self.client.get(
+                '/api/ingredients/',
+                {'name': 'сахар' * 100}
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class CountersTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            User.objects.create_user(
+                email=f'{username}@foodgram.ru',
+                username=username,
+                first_name='Имя',
+                last_name='Фамилия',
+                password='password'
+            )
+            for username in ('author', 'reader')
+        )
+        cls.recipes = [
+            Recipes.objects.create(
+                author=cls.author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.reader)
+
+    def counters(self):
+        self.author.refresh_from_db()
+        return (
+            self.author.recipes_count,
+            self.author.followers_count,
+            [
+                recipe.favorites_count
+                for recipe in Recipes.objects.order_by('id')
+            ]
+        )
+
+    def test_counters_follow_changes(self):
+        self.client.post(f'/api/recipes/{self.recipes[0].id}/favorite/')
+        self.client.post(
+            '/api/recipes/favorite/',
+            {'recipes': [recipe.id for recipe in self.recipes]},
+            format='json'
+        )
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.counters(), (3, 1, [1, 1, 1]))
+
+        self.client.delete(f'/api/recipes/{self.recipes[1].id}/favorite/')
+        self.client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.recipes[2].delete()
+        self.assertEqual(self.counters(), (2, 0, [1, 0]))
+
+        self.recipes[0].name = 'Новое название'
+        self.recipes[0].save()
+        self.author.save()
+        self.assertEqual(self.counters(), (2, 0, [1, 0]))
+
+    def test_bulk_add_counts_rows_it_lost_to_a_single_add(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipes[0])
+        BulkFavoriteView().recipes_added(self.reader, [self.recipes[0].id])
+        self.assertEqual(self.counters(), (3, 0, [1, 0, 0]))
+
+    def test_reconcile_command(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipes[0])
+        Recipes.objects.filter(id=self.recipes[0].id).update(
+            favorites_count=5
+        )
+        User.objects.filter(id=self.author.id).update(recipes_count=0)
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_counters', '--check')
+
+        call_command('reconcile_counters')
+        self.assertEqual(self.counters(), (3, 0, [1, 0, 0]))
+        call_command('reconcile_counters', '--check')
+
+
+class RecipeSearchTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Рецептов',
+            password='password'
+        )
+        apple = Ingredients.objects.create(name='Яблоки', measurement_unit='г')
+        cls.pie, cls.salad, cls.soup = (
+            Recipes.objects.create(
+                author=cls.author,
+                name=name,
+                text=text,
+                cooking_time=10
+            )
+            for name, text in (
+                ('Яблочный пирог', 'Испечь пирог в духовке'),
+                ('Салат', 'Подавать с пирогом'),
+                ('Суп', 'Сварить бульон'),
+            )
+        )
+        IngredientsInRecipe.objects.create(
+            recipe=cls.salad,
+            ingredient=apple,
+            amount=100
+        )
+
+    def setUp(self):
+        bump_search_version()
+
+    def search(self, query):
+        response = self.client.get(self.url, {'search': query})
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_ranked_search(self):
+        self.assertEqual(self.search('пирог'), ['Яблочный пирог', 'Салат'])
+        self.assertEqual(self.search('яблок'), ['Салат'])
+        self.assertEqual(self.search('пирог духовк'), ['Яблочный пирог'])
+        self.assertEqual(self.search('торт'), [])
+        response = self.client.get(self.url, {'search': 'пирог', 'page': 1})
+        self.assertEqual(response.data['count'], 2)
+
+    def test_index_follows_writes(self):
+        self.soup.name = 'Пирог с капустой'
+        self.soup.save()
+        self.assertEqual(
+            self.search('капуст'),
+            ['Пирог с капустой']
+        )
+        self.pie.delete()
+        self.assertEqual(self.search('пирог'), ['Пирог с капустой', 'Салат'])
+
+
+class CoverageIndexTest(APITestCase):
+    url = '/api/recipes/by-ingredients/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Рецептов',
+            password='password'
+        )
+        cls.flour, cls.eggs, cls.milk, cls.sugar = (
+            Ingredients.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Яйца', 'Молоко', 'Сахар')
+        )
+        cls.pancakes = cls.create_recipe(
+            'Блины',
+            (cls.flour, cls.eggs, cls.milk)
+        )
+        cls.omelette = cls.create_recipe('Омлет', (cls.eggs, cls.milk))
+        cls.cake = cls.create_recipe(
+            'Торт',
+            (cls.flour, cls.eggs, cls.sugar)
+        )
+
+    @classmethod
+    def create_recipe(cls, name, ingredients):
+        recipe = Recipes.objects.create(
+            author=cls.author,
+            name=name,
+            text='Описание',
+            cooking_time=10
+        )
+
+        for ingredient in ingredients:
+            IngredientsInRecipe.objects.create(
+                recipe=recipe,
+                ingredient=ingredient,
+                amount=1
+            )
+
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        coverage_index.reset()
+
+    def rank(self, *ingredients):
+        response = self.client.get(self.url, {
+            'ingredients': ','.join(str(item.id) for item in ingredients)
+        })
+        return [
+            (
+                recipe['name'],
+                recipe['matched_ingredients_count'],
+                [item['name'] for item in recipe['missing_ingredients']]
+            )
+            for recipe in response.data['results']
+        ]
+
+    def test_recipes_ranked_by_coverage(self):
+        self.assertEqual(self.rank(self.eggs, self.milk), [
+            ('Омлет', 2, []),
+            ('Блины', 2, ['Мука']),
+            ('Торт', 1, ['Мука', 'Сахар']),
+        ])
+        self.assertEqual(self.rank(self.sugar), [
+            ('Торт', 1, ['Мука', 'Яйца']),
+        ])
+
+        response = self.client.get(self.url, {'ingredients': 'мука'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_writes(self):
+        self.rank(self.sugar)
+        IngredientsInRecipe.objects.create(
+            recipe=self.omelette,
+            ingredient=self.sugar,
+            amount=1
+        )
+        self.omelette.save()
+        cake_id = self.cake.id
+        self.cake.delete()
+
+        self.assertEqual(self.rank(self.sugar), [
+            ('Омлет', 1, ['Яйца', 'Молоко']),
+        ])
+        self.assertNotIn(
+            cake_id,
+            coverage_index.get_state().recipe_ingredients
+        )
+
+
+class SimilarRecipesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Рецептов',
+            password='password'
+        )
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {number}',
+                measurement_unit='г'
+            )
+            for number in range(13)
+        ]
+        cls.original, cls.copy, cls.variation, cls.other = (
+            cls.create_recipe(name, ingredients)
+            for name, ingredients in (
+                ('Оригинал', cls.ingredients[:10]),
+                ('Копия', cls.ingredients[:10]),
+                ('Вариация', cls.ingredients[:9] + [cls.ingredients[10]]),
+                ('Другой', cls.ingredients[11:]),
+            )
+        )
+
+    @classmethod
+    def create_recipe(cls, name, ingredients):
+        recipe = Recipes.objects.create(
+            author=cls.author,
+            name=name,
+            text='Описание',
+            cooking_time=10
+        )
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            SIMILARITY_INDEX_FILE=os.path.join(directory.name, 'index.npz')
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(similarity_index.reset)
+        cache.clear()
+        similarity_index.reset()
+
+    def similar(self, recipe):
+        response = self.client.get(f'/api/recipes/{recipe.id}/similar/')
+        return [
+            (item['name'], item['similarity'] == 1)
+            for item in response.data
+        ]
+
+    def test_similar_recipes(self):
+        call_command('build_similarity_index')
+        self.assertEqual(
+            self.similar(self.original),
+            [('Копия', True), ('Вариация', False)]
+        )
+
+        with self.assertNumQueries(1):
+            self.similar(self.original)
+
+        self.assertEqual(self.similar(self.other), [])
+        response = self.client.get('/api/recipes/999/similar/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/api/recipes/abc/similar/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_index_follows_writes(self):
+        call_command('build_similarity_index')
+        self.similar(self.original)
+        IngredientsInRecipe.objects.filter(recipe=self.other).delete()
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(
+                recipe=self.other,
+                ingredient=ingredient,
+                amount=1
+            )
+            for ingredient in self.ingredients[:10]
+        )
+        self.other.save()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.copy.delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            similar = self.similar(self.original)
+
+        self.assertEqual(similar, [('Другой', True), ('Вариация', False)])
+        self.assertEqual(
+            [
+                query['sql'] for query in queries.captured_queries
+                if 'FROM "recipes_recipes"' in query['sql']
+                and 'WHERE' not in query['sql']
+                and 'MAX(' not in query['sql']
+                and not query['sql'].startswith(
+                    'SELECT "recipes_recipes"."id" FROM'
+                )
+            ],
+            []
+        )
+
+    def test_missing_index_file_is_not_built_in_request(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.similar(self.original), [])
+
+
+class RecipeFacetsTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.other_author = (
+            User.objects.create_user(
+                email=f'{username}@foodgram.ru',
+                username=username,
+                first_name='Автор',
+                last_name='Рецептов',
+                password='password'
+            )
+            for username in ('author', 'other')
+        )
+        cls.breakfast = Tags.objects.create(name='Завтрак', slug='breakfast')
+        cls.lunch = Tags.objects.create(name='Обед', slug='lunch')
+        cls.porridge = cls.create_recipe(cls.author, cls.breakfast)
+        cls.create_recipe(cls.author, cls.breakfast, cls.lunch)
+        cls.soup = cls.create_recipe(cls.other_author, cls.lunch)
+
+    @classmethod
+    def create_recipe(cls, author, *tags):
+        recipe = Recipes.objects.create(
+            author=author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+        RecipeTags.objects.bulk_create(
+            RecipeTags(recipe=recipe, tag=tag) for tag in tags
+        )
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+
+    def facets(self, **params):
+        response = self.client.get(self.url, {'facets': 'tags', **params})
+        return response.data['facets']['tags']
+
+    def test_tag_counts_ignore_selected_tags(self):
+        self.assertEqual(self.facets(), {'breakfast': 2, 'lunch': 2})
+
+        response = self.client.get(self.url, {
+            'facets': 'tags',
+            'author': self.author.id,
+            'tags': 'lunch',
+        })
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(
+            response.data['facets']['tags'],
+            {'breakfast': 2, 'lunch': 1}
+        )
+        self.assertNotIn('facets', self.client.get(self.url).data)
+
+    def test_anonymous_counts_are_cached(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.facets(author=self.author.id)
+
+        with CaptureQueriesContext(connection) as warm:
+            self.facets(author=self.author.id, tags='lunch')
+
+        self.assertEqual(
+            [
+                'GROUP BY' in query['sql']
+                for query in (*cold.captured_queries, *warm.captured_queries)
+            ].count(True),
+            1
+        )
+
+        self.create_recipe(self.author, self.lunch)
+        self.assertEqual(
+            self.facets(author=self.author.id),
+            {'breakfast': 2, 'lunch': 2}
+        )
+
+    def test_authenticated_counts_follow_viewer_filters(self):
+        self.client.force_authenticate(self.author)
+        Favorite.objects.create(user=self.author, recipe=self.soup)
+        self.assertEqual(
+            self.facets(is_favorited=1),
+            {'breakfast': 0, 'lunch': 1}
+        )
+
+        Favorite.objects.create(user=self.author, recipe=self.porridge)
+        self.assertEqual(
+            self.facets(is_favorited=1),
+            {'breakfast': 1, 'lunch': 1}
+        )
+
+
+class RecipeRankingTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Рецептов',
+            password='password'
+        )
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@foodgram.ru',
+                username=f'user{number}',
+                first_name='Пользователь',
+                last_name='Сайта',
+                password='password'
+            )
+            for number in range(3)
+        ]
+        cls.classic, cls.fresh, cls.unnoticed = (
+            Recipes.objects.create(
+                author=cls.author,
+                name=name,
+                text='Описание',
+                cooking_time=10
+            )
+            for name in ('Классика', 'Новинка', 'Незамеченный')
+        )
+
+        for user in cls.users:
+            Favorite.objects.create(user=user, recipe=cls.classic)
+
+        Favorite.objects.filter(recipe=cls.classic).update(
+            created_at=timezone.now() - timedelta(days=20)
+        )
+        Favorite.objects.create(user=cls.users[0], recipe=cls.fresh)
+        ShoppingCart.objects.create(user=cls.users[1], recipe=cls.fresh)
+
+    def setUp(self):
+        cache.clear()
+
+    def names(self, ordering):
+        response = self.client.get(self.url, {'ordering': ordering})
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_orderings_are_served_from_rankings(self):
+        call_command('update_rankings')
+
+        self.assertEqual(
+            self.names('popular'),
+            ['Классика', 'Новинка', 'Незамеченный']
+        )
+        self.assertEqual(
+            self.names('trending'),
+            ['Новинка', 'Классика', 'Незамеченный']
+        )
+        self.assertEqual(
+            self.client.get(self.url, {'ordering': 'name'}).status_code,
+            400
+        )
+
+    def test_new_recipes_are_listed_before_recomputation(self):
+        call_command('update_rankings')
+        Recipes.objects.create(
+            author=self.author,
+            name='Свежий',
+            text='Описание',
+            cooking_time=10
+        )
+
+        self.assertEqual(
+            self.names('popular'),
+            ['Классика', 'Новинка', 'Свежий', 'Незамеченный']
+        )
+
+    def test_recomputed_rankings_change_etag(self):
+        call_command('update_rankings')
+        response = self.client.get(self.url, {'ordering': 'trending'})
+
+        ShoppingCart.objects.create(user=self.users[2], recipe=self.classic)
+        Favorite.objects.filter(recipe=self.classic).update(
+            created_at=timezone.now()
+        )
+        call_command('update_rankings')
+
+        response = self.client.get(
+            self.url,
+            {'ordering': 'trending'},
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['name'] for recipe in response.data['results']],
+            ['Классика', 'Новинка', 'Незамеченный']
+        )
+
+
+class ConditionalRecipeTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password',
+            first_name='Автор',
+            last_name='Рецептов'
+        )
+        cls.recipe = Recipes.objects.create(
+            author=cls.author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.author)
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_conditional_get(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertNotModified(self.url, etag)
+
+        self.client.post(f'{self.url}{self.recipe.id}/favorite/')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+
+        etag = response['ETag']
+        Recipes.objects.create(
+            author=self.author,
+            name='Новый рецепт',
+            text='Описание',
+            cooking_time=5
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_list_is_not_validated_by_date(self):
+        self.client.force_authenticate(None)
+        Recipes.objects.create(
+            author=self.author,
+            name='Новый рецепт',
+            text='Описание',
+            cooking_time=5
+        )
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+
+        self.recipe.delete()
+        response = self.client.get(
+            self.url,
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_conditional_get(self):
+        url = f'{self.url}{self.recipe.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        self.recipe.name = 'Новое название'
+        self.recipe.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['name'], 'Новое название')
+
+        etag = response['ETag']
+        self.client.force_authenticate(None)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class SingleFlightTest(SimpleTestCase):
+    key = 'recipes:representation:1'
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.lock = threading.Lock()
+
+    def build(self):
+        with self.lock:
+            self.builds += 1
+
+        time.sleep(0.2)
+        return {'id': 1}
+
+    def test_concurrent_misses_build_once(self):
+        workers = (SingleFlight(), SingleFlight())
+        barrier = threading.Barrier(20)
+
+        def request(number):
+            barrier.wait()
+            return workers[number % 2].get_or_set(self.key, self.build)
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(request, range(20)))
+
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(results, [{'id': 1}] * 20)
+        self.assertEqual(cache.get(self.key), {'id': 1})
+
+    def test_uncacheable_result_is_not_shared(self):
+        self.assertIsNone(SingleFlight().get_or_set(self.key, lambda: None))
+        self.assertIsNone(cache.get(self.key))
+        self.assertIsNone(cache.get(f'{self.key}:lease'))
+
+
+class ConcurrentToggleTest(APITransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest(
+                'SQLite в памяти не поддерживает параллельную запись'
+            )
+
+        self.user = User.objects.create_user(
+            email='clicker@foodgram.ru',
+            username='clicker',
+            first_name='Быстрый',
+            last_name='Кликер',
+            password='password'
+        )
+        self.recipe = Recipes.objects.create(
+            author=self.user,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+
+    def add(self, url):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        try:
+            return client.post(url).status_code
+        finally:
+            connection.close()
+
+    def test_concurrent_adds(self):
+        for url, model in (
+            (f'/api/recipes/{self.recipe.id}/favorite/', Favorite),
+            (f'/api/recipes/{self.recipe.id}/shopping_cart/', ShoppingCart),
+        ):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                statuses = list(executor.map(self.add, [url] * 8))
+
+            self.assertEqual(sorted(statuses), [201] + [400] * 7)
+            self.assertEqual(model.objects.filter(user=self.user).count(), 1)
+
+    def test_concurrent_cart_adds_share_new_line(self):
+        if not connection.features.has_select_for_update:
+            self.skipTest('Нужны блокировки строк')
+
+        ingredient = Ingredients.objects.create(
+            name='Соль',
+            measurement_unit='г'
+        )
+        recipes = [self.recipe] + [
+            Recipes.objects.create(
+                author=self.user,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10
+            )
+            for number in range(7)
+        ]
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(recipe=recipe, ingredient=ingredient, amount=2)
+            for recipe in recipes
+        )
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(self.add, [
+                f'/api/recipes/{recipe.id}/shopping_cart/'
+                for recipe in recipes
+            ]))
+
+        self.assertEqual(statuses, [201] * 8)
+        self.assertEqual(
+            ShoppingListLine.objects.get(
+                user=self.user,
+                ingredient=ingredient
+            ).total_amount,
+            16
+        )
+
+    def test_bulk_and_single_cart_adds_count_each_recipe_once(self):
+        if not connection.features.has_select_for_update:
+            self.skipTest('Нужны блокировки строк')
+
+        ingredient = Ingredients.objects.create(
+            name='Перец',
+            measurement_unit='г'
+        )
+        IngredientsInRecipe.objects.create(
+            recipe=self.recipe,
+            ingredient=ingredient,
+            amount=3
+        )
+
+        def add_in_bulk(url):
+            client = APIClient()
+            client.force_authenticate(self.user)
+
+            try:
+                return client.post(
+                    url,
+                    {'recipes': [self.recipe.id]},
+                    format='json'
+                ).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(
+                lambda number: (add_in_bulk if number % 2 else self.add)(
+                    '/api/recipes/shopping_cart/' if number % 2
+                    else f'/api/recipes/{self.recipe.id}/shopping_cart/'
+                ),
+                range(8)
+            ))
+
+        self.assertNotIn(500, statuses)
+        self.assertEqual(
+            ShoppingListLine.objects.get(
+                user=self.user,
+                ingredient=ingredient
+            ).total_amount,
+            3
+        )
@@ -1,9 +1,11 @@
-from django.http import HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-from rest_framework import viewsets, status
+from rest_framework import generics, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (IsAuthenticatedOrReadOnly,
@@ -12,14 +14,34 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .models import (Recipes, Ingredients, Favorite,
-                     ShoppingCart, IngredientsInRecipe)
+                     ShoppingCart, ShoppingListLine, lock_users)
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (RecipeSerializer, IngredientsSerializer,
-                          FavoriteSerializer, ShoppingCartSerializer)
+                          FavoriteSerializer, ShoppingCartSerializer,
+                          RecipeIdsSerializer, IngredientIdsSerializer)
+from .catalog import get_catalog
+from .conditional import ConditionalRecipeMixin, touch_viewer
+from .counters import expected_count
+from .coverage_index import coverage_index
+from .exporters import EXPORTERS
+from .facets import facets_version, get_tag_counts, requested_facets
 from .filters import IngredientFilter, RecipeFilter
+from .ingredient_index import (ingredient_index,
+                               INGREDIENTS_VERSION_CACHE_KEY)
+from .negotiation import IgnoreClientContentNegotiation
+from .pagination import RecipeCursorPagination
+from .rankings import RANKINGS, ranking_version
+from .recipe_cache import get_short_representations
+from .reference_cache import ReferenceCacheMixin
+from .similarity import similarity_index
+from users.models import Followers
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+SIMILAR_RECIPES_LIMIT = 10
+SIMILAR_RECIPES_MAX_LIMIT = 50
+
+
+class RecipeViewSet(ConditionalRecipeMixin, viewsets.ModelViewSet):
     queryset = Recipes.objects.all()
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend,)
@@ -27,13 +49,99 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     pagination_class = PageNumberPagination
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            query_params = self.request.query_params
+
+            if query_params.get('ordering') in RANKINGS:
+                self._paginator = self.pagination_class()
+            elif (query_params.get('pagination') == 'cursor'
+                    or 'cursor' in query_params):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = Recipes.objects.select_related('author').defer(
+            'search_vector'
+        )
+        user = self.request.user
+
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk')
+                )),
+                author_is_subscribed=Exists(Followers.objects.filter(
+                    follower=user,
+                    following=OuterRef('author')
+                ))
+            )
+
+        return queryset.order_by('-id')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+
+        if (response.status_code == 200
+                and 'tags' in requested_facets(request.query_params)):
+            response.data['facets'] = {'tags': self.tag_facets()}
+
+        return response
+
+    def list_state(self):
+        state = super().list_state()
+
+        if self.request.query_params.get('ordering') in RANKINGS:
+            state = (ranking_version(), *state)
+
+        if requested_facets(self.request.query_params):
+            state = (facets_version(), *state)
+
+        return state
+
+    def tag_facets(self):
+        query_params = self.request.query_params.copy()
+        query_params.pop('tags', None)
+        query_params.pop('ordering', None)
+        filterset = self.filterset_class(
+            query_params,
+            queryset=Recipes.objects.all(),
+            request=self.request
+        )
+        filters = {
+            name: query_params.getlist(name)
+            for name in filterset.filters
+            if name in query_params
+        }
+
+        return get_tag_counts(filterset.qs, filters, self.request.user)
+
     def perform_create(self, serializer):
         if self.request.user:
             serializer.save(author=self.request.user)
+            self.reload_instance(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.reload_instance(serializer)
+
+    def reload_instance(self, serializer):
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
 
     @action(detail=True, methods=['get', 'patch'], url_path='edit')
     def edit(self, request, id=None):
-        recipe = get_object_or_404(self.queryset, pk=id)
+        recipe = get_object_or_404(self.get_queryset(), pk=id)
 
         if recipe.author != request.user:
             return Response(
@@ -50,9 +158,82 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 recipe, data=request.data, partial=True
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            self.perform_update(serializer)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], url_path='by-ingredients')
+    def by_ingredients(self, request):
+        serializer = IngredientIdsSerializer(data={
+            'ingredients': [
+                value
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',')
+                if value
+            ]
+        })
+        serializer.is_valid(raise_exception=True)
+        ingredient_ids = set(serializer.validated_data['ingredients'])
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            coverage_index.rank(ingredient_ids),
+            request,
+            view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        page = [
+            (recipes[recipe_id], covered, missing)
+            for recipe_id, covered, missing in page
+            if recipe_id in recipes
+        ]
+        representations = self.get_serializer(
+            [recipe for recipe, _, _ in page],
+            many=True
+        ).data
+
+        for representation, (_, covered, missing) in zip(
+            representations,
+            page
+        ):
+            representation['matched_ingredients_count'] = covered
+            representation['missing_ingredients'] = [
+                ingredient for ingredient in representation['ingredients']
+                if ingredient['id'] not in ingredient_ids
+            ]
+
+        return paginator.get_paginated_response(representations)
+
+    @action(detail=True, methods=['get'], url_path='similar')
+    def similar(self, request, pk=None):
+        try:
+            limit = min(
+                int(request.query_params['limit']),
+                SIMILAR_RECIPES_MAX_LIMIT
+            )
+        except (KeyError, ValueError):
+            limit = SIMILAR_RECIPES_LIMIT
+
+        similar = (
+            similarity_index.similar(int(pk), max(limit, 0))
+            if pk.isdigit() else None
+        )
+
+        if similar is None:
+            generics.get_object_or_404(Recipes, pk=pk)
+            return Response([])
+
+        representations = get_short_representations(
+            [recipe_id for recipe_id, _ in similar]
+        )
+
+        return Response([
+            {**representations[recipe_id], 'similarity': round(score, 3)}
+            for recipe_id, score in similar
+            if recipe_id in representations
+        ])
+
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_short_link(self, request, pk=None):
         recipe = self.get_object()
@@ -64,140 +245,263 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return f'{basse_url}recipes/{recipe.id}'
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(ReferenceCacheMixin,
+                         viewsets.ReadOnlyModelViewSet):
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    version_cache_key = INGREDIENTS_VERSION_CACHE_KEY
+
+    def uncached_list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+
+        if not name:
+            catalog = get_catalog()
+
+            if catalog is None:
+                return super().uncached_list(request, *args, **kwargs)
+
+            return Response(catalog.ingredients())
+
+        try:
+            limit = int(request.query_params['limit'])
+        except (KeyError, ValueError):
+            limit = None
+
+        return Response(ingredient_index.search(name, limit))
+
+    def uncached_retrieve(self, request, *args, **kwargs):
+        catalog = get_catalog()
+        ingredient = None
+
+        if catalog is not None and kwargs['pk'].isdigit():
+            ingredient = catalog.ingredient(int(kwargs['pk']))
+
+        if ingredient is None:
+            return super().uncached_retrieve(request, *args, **kwargs)
 
+        return Response(ingredient)
 
-class FavoriteViewSet(APIView):
+
+class ShoppingListMixin:
+    def recipes_added(self, user, recipe_ids):
+        ShoppingListLine.objects.add_recipes(user, recipe_ids)
+
+    def recipes_removed(self, user, recipe_ids):
+        ShoppingListLine.objects.remove_recipes(user, recipe_ids)
+
+
+class RecipeListView(APIView):
     permission_classes = (IsAuthenticated,)
+    model = None
+    serializer_class = None
+    already_added_error = None
+    not_added_error = None
 
-    def post(self, request, recipe_id):
-        recipe = get_object_or_404(Recipes, id=recipe_id)
+    def recipes_added(self, user, recipe_ids):
+        pass
 
-        if Favorite.objects.filter(
-            user=request.user,
-            recipe=recipe
-        ).exists():
-            return Response(
-                {'error': 'Рецепт уже добавлен в избранное!'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+    def recipes_removed(self, user, recipe_ids):
+        pass
 
-        data = {
-            'user': request.user.id,
-            'recipe': recipe.id
-        }
+    def post(self, request, recipe_id):
+        recipe = get_object_or_404(Recipes, id=recipe_id)
 
-        serializer = FavoriteSerializer(
-            data=data,
+        with transaction.atomic():
+            lock_users([request.user.id])
+
+            try:
+                with transaction.atomic():
+                    instance = self.model.objects.create(
+                        user=request.user,
+                        recipe=recipe
+                    )
+            except IntegrityError:
+                return Response(
+                    {'error': self.already_added_error},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            self.recipes_added(request.user, [recipe.id])
+
+        serializer = self.serializer_class(
+            instance,
             context={'request': request}
         )
-
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, recipe_id):
-        recipe = get_object_or_404(Recipes, id=recipe_id)
+        with transaction.atomic():
+            lock_users([request.user.id])
+            deleted, _ = self.model.objects.filter(
+                user=request.user,
+                recipe_id=recipe_id
+            ).delete()
+
+            if deleted:
+                self.recipes_removed(request.user, [recipe_id])
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+        get_object_or_404(Recipes, id=recipe_id)
+        return Response(
+            {'error': self.not_added_error},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-        if Favorite.objects.filter(
-            user=request.user,
-            recipe=recipe
-        ).exists():
-            Favorite.objects.get(user=request.user, recipe=recipe).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        else:
-            return Response(
-                {'error': 'Рецепта нет в избранном!'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
 
+class FavoriteViewSet(RecipeListView):
+    model = Favorite
+    serializer_class = FavoriteSerializer
+    already_added_error = 'Рецепт уже добавлен в избранное!'
+    not_added_error = 'Рецепта нет в избранном!'
 
-class ShoppingCartViewSet(APIView):
-    permission_classes = (IsAuthenticatedOrReadOnly,)
 
-    def post(self, request, recipe_id):
-        recipe = get_object_or_404(Recipes, id=recipe_id)
+class ShoppingCartViewSet(ShoppingListMixin, RecipeListView):
+    model = ShoppingCart
+    serializer_class = ShoppingCartSerializer
+    already_added_error = 'Рецепт уже добавлен в корзину!'
+    not_added_error = 'Рецепта нет в списке покупок!'
 
-        if ShoppingCart.objects.filter(
-            user=request.user,
-            recipe=recipe.id
-        ).exists():
-            return Response(
-                {'error': 'Рецепт уже добавлен в корзину!'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
 
-        data = {
-            'user': request.user.id,
-            'recipe': recipe.id
-        }
+class BulkRecipeListView(APIView):
+    permission_classes = (IsAuthenticated,)
+    model = None
 
-        serializer = ShoppingCartSerializer(
-            data=data,
-            context={'request': request}
+    def get_recipe_ids(self, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['recipes']))
+
+    def get_added_states(self, request, recipe_ids):
+        return dict(
+            Recipes.objects.filter(
+                id__in=recipe_ids
+            ).annotate(
+                is_added=Exists(self.model.objects.filter(
+                    user=request.user,
+                    recipe=OuterRef('pk')
+                ))
+            ).values_list('id', 'is_added')
         )
 
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def recipes_added(self, user, recipe_ids):
+        pass
+
+    def recipes_removed(self, user, recipe_ids):
+        pass
+
+    def post(self, request):
+        recipe_ids = self.get_recipe_ids(request)
+
+        with transaction.atomic():
+            lock_users([request.user.id])
+            states = self.get_added_states(request, recipe_ids)
+            new_ids = [
+                recipe_id for recipe_id, is_added in states.items()
+                if not is_added
+            ]
+            self.model.objects.bulk_create(
+                [
+                    self.model(user=request.user, recipe_id=recipe_id)
+                    for recipe_id in new_ids
+                ],
+                ignore_conflicts=True
+            )
+            self.recipes_added(request.user, new_ids)
+
+        touch_viewer(request.user.id)
+
+        results = [
+            {
+                'id': recipe_id,
+                'status': (
+                    'not_found' if recipe_id not in states
+                    else 'already_added' if states[recipe_id]
+                    else 'added'
+                )
+            }
+            for recipe_id in recipe_ids
+        ]
+
+        return Response({'recipes': results}, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        recipe_ids = self.get_recipe_ids(request)
+
+        with transaction.atomic():
+            lock_users([request.user.id])
+            states = self.get_added_states(request, recipe_ids)
+            removed_ids = [
+                recipe_id for recipe_id, is_added in states.items()
+                if is_added
+            ]
+            self.model.objects.filter(
+                user=request.user,
+                recipe_id__in=removed_ids
+            ).delete()
+            self.recipes_removed(request.user, removed_ids)
+
+        results = [
+            {
+                'id': recipe_id,
+                'status': (
+                    'not_found' if recipe_id not in states
+                    else 'removed' if states[recipe_id]
+                    else 'not_added'
+                )
+            }
+            for recipe_id in recipe_ids
+        ]
+
+        return Response({'recipes': results}, status=status.HTTP_200_OK)
+
+
+class BulkFavoriteView(BulkRecipeListView):
+    model = Favorite
+
+    def recipes_added(self, user, recipe_ids):
+        Recipes.objects.filter(id__in=recipe_ids).update(
+            favorites_count=expected_count(Favorite, 'recipe')
+        )
 
-    def delete(self, request, recipe_id):
-        recipe = get_object_or_404(Recipes, id=recipe_id)
 
-        if ShoppingCart.objects.filter(
-            user=request.user,
-            recipe=recipe_id
-        ).exists():
-            ShoppingCart.objects.get(user=request.user, recipe=recipe).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        else:
-            return Response(
-                {'error': 'Рецепта нет в списке покупок!'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+class BulkShoppingCartView(ShoppingListMixin, BulkRecipeListView):
+    model = ShoppingCart
 
 
 class DownloadShoppingCartView(APIView):
     permission_classes = (IsAuthenticated,)
+    content_negotiation_class = IgnoreClientContentNegotiation
 
     def get(self, request):
-        shopping_cart_items = ShoppingCart.objects.filter(user=request.user)
-        recipes = (item.recipe for item in shopping_cart_items)
-
-        ingredients = {}
+        export_format = request.query_params.get('format', 'txt')
 
-        for recipe in recipes:
-            ingredients_in_recipe = IngredientsInRecipe.objects.filter(
-                recipe=recipe
+        if export_format not in EXPORTERS:
+            return Response(
+                {'error': 'Поддерживаемые форматы: '
+                          f'{", ".join(EXPORTERS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            for ingredient_in_recipe in ingredients_in_recipe:
-                name = ingredient_in_recipe.ingredient.name
-                amount = ingredient_in_recipe.amount
-                meas_unit = ingredient_in_recipe.ingredient.measurement_unit
-
-                key = f"{name} ({meas_unit})"
-
-                if key in ingredients:
-                    ingredients[key] += amount
-                else:
-                    ingredients[key] = amount
+        exporter, content_type = EXPORTERS[export_format]
 
-        file_content = 'Список покупок:\n\n'
+        ingredients = ShoppingListLine.objects.filter(
+            user=request.user
+        ).values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'total_amount'
+        ).order_by('ingredient__name')
 
-        for ingredient, amount in ingredients.items():
-            file_content += f'{ingredient}: {amount}\n'
-
-        response = HttpResponse(
-            file_content,
-            content_type='text/plain'
+        response = StreamingHttpResponse(
+            exporter(ingredients.iterator()),
+            content_type=content_type
         )
 
-        response['Content-Disposition'] = 'attachment; filename="shopcart.txt"'
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopcart.{export_format}"'
+        )
 
         return response
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tags',
+            name='slug',
+            field=models.SlugField(unique=True, verbose_name='slug'),
+        ),
+    ]
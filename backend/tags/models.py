@@ -1,6 +1,23 @@
+from django.core.cache import cache
 from django.db import models
 
 
+TAG_SLUG_IDS_CACHE_KEY = 'tags:slug_ids'
+TAGS_VERSION_CACHE_KEY = 'tags:version'
+
+
+class TagsManager(models.Manager):
+
+    def slug_ids(self):
+        return cache.get_or_set(
+            TAG_SLUG_IDS_CACHE_KEY,
+            lambda: dict(self.values_list('slug', 'id'))
+        )
+
+    def slug_choices(self):
+        return [(slug, slug) for slug in self.slug_ids()]
+
+
 class Tags(models.Model):
     name = models.CharField(
         max_length=256,
@@ -10,10 +27,13 @@ class Tags(models.Model):
     )
     slug = models.SlugField(
         verbose_name='slug',
+        unique=True,
         blank=False,
         null=False
     )
 
+    objects = TagsManager()
+
     class Meta:
         verbose_name = 'Тэг'
         verbose_name_plural = 'Тэги'
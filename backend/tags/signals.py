@@ -0,0 +1,14 @@
+import uuid
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Tags, TAG_SLUG_IDS_CACHE_KEY, TAGS_VERSION_CACHE_KEY
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+def clear_tags_cache(**kwargs):
+    cache.delete(TAG_SLUG_IDS_CACHE_KEY)
+    cache.set(TAGS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
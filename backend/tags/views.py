@@ -1,10 +1,34 @@
 from rest_framework import viewsets
+from rest_framework.response import Response
 
-from tags.models import Tags
+from recipes.catalog import get_catalog
+from recipes.reference_cache import ReferenceCacheMixin
+from tags.models import Tags, TAGS_VERSION_CACHE_KEY
 from tags.serializers import TagSerializer
 
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+class TagsViewSet(ReferenceCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tags.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    version_cache_key = TAGS_VERSION_CACHE_KEY
+
+    def uncached_list(self, request, *args, **kwargs):
+        catalog = get_catalog()
+
+        if catalog is None:
+            return super().uncached_list(request, *args, **kwargs)
+
+        return Response(catalog.tags())
+
+    def uncached_retrieve(self, request, *args, **kwargs):
+        catalog = get_catalog()
+        tag = None
+
+        if catalog is not None and kwargs['pk'].isdigit():
+            tag = catalog.tag(int(kwargs['pk']))
+
+        if tag is None:
+            return super().uncached_retrieve(request, *args, **kwargs)
+
+        return Response(tag)
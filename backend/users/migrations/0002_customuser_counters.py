@@ -0,0 +1,37 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:17
+
+from django.db import migrations, models
+
+from recipes.counters import expected_count
+
+
+def fill_followers_count(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Followers = apps.get_model('users', 'Followers')
+    CustomUser.objects.update(
+        followers_count=expected_count(Followers, 'following')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(
+            fill_followers_count,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -2,7 +2,23 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class CustomUser(AbstractUser):
+class CounterFieldsMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred_fields = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred_fields
+            ]
+
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
     avatar = models.ImageField(
         verbose_name='Аватар',
         upload_to='users/avatars',
@@ -31,12 +47,25 @@ class CustomUser(AbstractUser):
         null=False
     )
 
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
+
     Followers = models.ManyToManyField(
         'self',
         through='Followers',
         blank=True
     )
 
+    counter_fields = ('recipes_count', 'followers_count')
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (
         'username',
@@ -45,10 +45,14 @@ class SimpleCustomUserSerializer(serializers.ModelSerializer):
             'last_name',
             'email',
             'is_subscribed',
-            'avatar'
+            'avatar',
+            'followers_count'
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+
         request = self.context.get('request')
 
         if request is not None and request.user.is_authenticated is True:
@@ -100,7 +104,6 @@ class CustomUserProfileSerializer(serializers.ModelSerializer):
 class CustomUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -113,10 +116,14 @@ class CustomUserSerializer(serializers.ModelSerializer):
             'is_subscribed',
             'avatar',
             'recipes',
-            'recipes_count'
+            'recipes_count',
+            'followers_count'
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+
         request = self.context.get('request')
 
         if request is None:
@@ -131,7 +138,13 @@ class CustomUserSerializer(serializers.ModelSerializer):
             return False
 
     def get_recipes(self, obj):
-        request = self.context.get('request')        
+        if hasattr(obj, 'latest_recipes'):
+            return FollowerRecipesSerializer(
+                obj.latest_recipes,
+                many=True
+            ).data
+
+        request = self.context.get('request')
 
         if request is None:
             return []
@@ -147,9 +160,6 @@ class CustomUserSerializer(serializers.ModelSerializer):
             many=True
         ).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class PasswordSerializer(serializers.Serializer):
     new_password = serializers.CharField(required=True)
@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APITestCase
+
+from .models import Followers
+from recipes.models import Recipes
+
+
+User = get_user_model()
+
+
+class SubscriptionsQueriesTest(APITestCase):
+    url = '/api/users/subscriptions/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            username='viewer',
+            email='viewer@example.com',
+            password='password',
+            first_name='Читатель',
+            last_name='Рецептов'
+        )
+
+        for number in range(10):
+            author = User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                password='password',
+                first_name='Автор',
+                last_name='Рецептов'
+            )
+            Followers.objects.create(follower=cls.viewer, following=author)
+
+            for recipe_number in range(number % 4):
+                Recipes.objects.create(
+                    author=author,
+                    name=f'Рецепт {recipe_number}',
+                    text='Описание',
+                    cooking_time=10
+                )
+
+    def setUp(self):
+        self.client.force_authenticate(self.viewer)
+
+    def test_queries_do_not_depend_on_page_size(self):
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'limit': 2, 'recipes_limit': 2})
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                self.url,
+                {'limit': 10, 'recipes_limit': 2}
+            )
+
+        self.assertEqual(response.data['count'], 10)
+        authors = {
+            author['username']: author for author in response.data['results']
+        }
+        author = authors['author3']
+        self.assertTrue(author['is_subscribed'])
+        self.assertEqual(author['recipes_count'], 3)
+        self.assertEqual(
+            [recipe['name'] for recipe in author['recipes']],
+            ['Рецепт 2', 'Рецепт 1']
+        )
+        self.assertEqual(authors['author4']['recipes'], [])
+
+    def test_without_recipes_limit(self):
+        response = self.client.get(self.url, {'limit': 10})
+        self.assertEqual(
+            [len(author['recipes']) for author in response.data['results']],
+            [number % 4 for number in range(10)]
+        )
+
+
+class UserListQueriesTest(APITestCase):
+    url = '/api/users/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            username='viewer',
+            email='viewer@example.com',
+            password='password',
+            first_name='Читатель',
+            last_name='Рецептов'
+        )
+
+        for number in range(8):
+            user = User.objects.create_user(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                password='password',
+                first_name='Пользователь',
+                last_name='Сайта'
+            )
+
+            if number % 2:
+                Followers.objects.create(follower=cls.viewer, following=user)
+
+    def setUp(self):
+        self.client.force_authenticate(self.viewer)
+
+    def test_is_subscribed_is_loaded_with_page(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'limit': 20})
+
+        self.assertEqual(
+            {
+                user['username']: user['is_subscribed']
+                for user in response.data['results']
+                if user['username'] != 'viewer'
+            },
+            {f'user{number}': bool(number % 2) for number in range(8)}
+        )
+
+        user = User.objects.get(username='user1')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'{self.url}{user.id}/')
+        self.assertTrue(response.data['is_subscribed'])
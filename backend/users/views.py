@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Exists, OuterRef, Value
 from django.shortcuts import get_object_or_404
 
-from rest_framework import status, viewsets, pagination
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticatedOrReadOnly,
                                         IsAuthenticated
@@ -12,6 +13,8 @@ from rest_framework.response import Response
 from djoser.views import UserViewSet
 
 from .models import Followers
+from api.pagination import PageNumberPagination
+from recipes.models import latest_recipes
 from .serializers import (AvatarSerializer, CustomUserSerializer,
                           FollowersSerializer, SimpleCustomUserSerializer,
                           PasswordSerializer, CreateCustomUserSerializer)
@@ -24,6 +27,20 @@ class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(Followers.objects.filter(
+                    follower=user,
+                    following=OuterRef('pk')
+                ))
+            )
+
+        return queryset.order_by('id')
+
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
             return SimpleCustomUserSerializer
@@ -124,24 +141,31 @@ class AvatarViewSet(APIView):
 
 class SubscriptionsViewSet(viewsets.ViewSet):
     permission_classes = (IsAuthenticated,)
-    pagination_class = pagination.PageNumberPagination
+    pagination_class = PageNumberPagination
 
     def list(self, request):
-        print("Запрос на подписки получен")
-        limit = request.query_params.get('limit', None)
-
         followings = User.objects.filter(
             following__follower=request.user
-        ).distinct()
-
-        if limit is not None:
-            limit = int(limit)
-            if limit < followings.count():
-                followings = followings[:limit]
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by('id')
 
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(followings, request)
 
+        try:
+            recipes_limit = int(request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            recipes_limit = None
+
+        author_recipes = {author.id: [] for author in page}
+
+        for recipe in latest_recipes(author_recipes, recipes_limit):
+            author_recipes[recipe.author_id].append(recipe)
+
+        for author in page:
+            author.latest_recipes = author_recipes[author.id]
+
         serializer = CustomUserSerializer(
             page,
             many=True,
@@ -176,6 +200,8 @@ class SubscribeViewSet(APIView):
             follower=request.user,
             following=follow_user
         )
+        follow_user.refresh_from_db(fields=['followers_count'])
+        follow_user.is_subscribed = True
 
         serializer = CustomUserSerializer(
             follow_user,